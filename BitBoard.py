@@ -0,0 +1,541 @@
+from typing import Tuple, List
+
+
+TEAMS = ("W", "B")
+OPPONENT = {"W": "B", "B": "W"}
+
+# Same Step orders as Prediction.trace_path, so the Results come out in the same order
+DIRECTIONS = [(1, 0), (0, 1), (-1, 0), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1)]
+KNIGHT_STEPS = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
+SLIDES = {"RO": range(0, 4), "BI": range(4, 8), "QU": range(0, 8)}
+# Pawn Conversions, coded by their index + 1 in move rows (0 for none)
+PROMOTIONS = ("QU", "RO", "BI", "KN")
+
+# Square Index -> (Row, Column) Position
+POSITIONS = [(x, y) for x in range(8) for y in range(8)]
+
+
+def square(pos: Tuple[int, int]) -> int:
+    """
+    Function to convert a (Row, Column) Position
+    into a Square Index from 0 to 63
+    """
+    return pos[0] * 8 + pos[1]
+
+
+def _targets(sq: int, steps: List[Tuple[int, int]]):
+    x, y = POSITIONS[sq]
+    return [(tx * 8 + ty, (tx, ty)) for tx, ty in ((x + dx, y + dy) for dx, dy in steps)
+            if 0 <= tx < 8 and 0 <= ty < 8]
+
+
+def _mask(squares) -> int:
+    mask = 0
+    for sq in squares:
+        mask |= 1 << sq
+    return mask
+
+
+# Precomputed Attack Tables
+KNIGHT_TARGETS = [_targets(sq, KNIGHT_STEPS) for sq in range(64)]
+KNIGHT_ATTACKS = [_mask(sq for sq, _ in KNIGHT_TARGETS[i]) for i in range(64)]
+KING_TARGETS = [_targets(sq, DIRECTIONS) for sq in range(64)]
+KING_ATTACKS = [_mask(sq for sq, _ in KING_TARGETS[i]) for i in range(64)]
+# Enemy King only guards the Orthogonal Neighbours (Distance check in trace_path)
+KING_GUARDS = [_mask(sq for sq, _ in _targets(i, DIRECTIONS[:4])) for i in range(64)]
+PAWN_ATTACKS = {
+    "W": [_mask(sq for sq, _ in _targets(i, [(1, 1), (1, -1)])) for i in range(64)],
+    "B": [_mask(sq for sq, _ in _targets(i, [(-1, 1), (-1, -1)])) for i in range(64)],
+}
+RAY_SQUARES, RAYS = [], []
+for _dx, _dy in DIRECTIONS:
+    _paths = []
+    for _sq in range(64):
+        _x, _y = POSITIONS[_sq]
+        _path = []
+        while 0 <= _x + _dx < 8 and 0 <= _y + _dy < 8:
+            _x, _y = _x + _dx, _y + _dy
+            _path.append((_x, _y))
+        _paths.append(_path)
+    RAY_SQUARES.append(_paths)
+    RAYS.append([_mask(square(p) for p in path) for path in _paths])
+# Rays going to higher Square Indices find their nearest Blocker at the lowest Bit
+FORWARD = [dx * 8 + dy > 0 for dx, dy in DIRECTIONS]
+# Squares strictly between two Squares on a line, 0 when they share none
+BETWEEN = [[0] * 64 for _ in range(64)]
+for _d in range(8):
+    for _sq in range(64):
+        for _n in range(64):
+            if RAYS[_d][_sq] >> _n & 1:
+                BETWEEN[_sq][_n] = RAYS[_d][_sq] & ~RAYS[_d][_n] & ~(1 << _n)
+FULL = (1 << 64) - 1
+FIRST_COLUMN = _mask(x * 8 for x in range(8))
+LAST_COLUMN = FIRST_COLUMN << 7
+END_ROWS = 0xFF | 0xFF << 56
+
+
+def _nearest(blockers: int, d: int) -> int:
+    if FORWARD[d]:
+        return (blockers & -blockers).bit_length() - 1
+    return blockers.bit_length() - 1
+
+
+def bit_squares(mask: int):
+    """
+    Function to list the Square Indices set in a Mask, lowest first
+    """
+    squares = []
+    while mask:
+        low = mask & -mask
+        squares.append(low.bit_length() - 1)
+        mask ^= low
+    return squares
+
+
+def _distance(a: int, b: int) -> int:
+    return max(abs((a >> 3) - (b >> 3)), abs((a & 7) - (b & 7)))
+
+
+class BitBoard:
+    """
+    Class to represent the Board as 64 bit Occupancy Masks
+    per Team and Piece Type, kept in sync by ChessBoard
+    """
+    def __init__(self):
+        self.pieces = {"W": {}, "B": {}}
+        self.teams = {"W": 0, "B": 0}
+        # Pieces still at their Initial Position (Piece.is_start)
+        self.unmoved = 0
+        self.squares = [None] * 64
+        # Squares reached by the Piece on every Square, and per Team how many
+        # Pieces reach each Square. Kings are left out, their steps are checked on demand
+        self.reach = [0] * 64
+        self.counts = {"W": [0] * 64, "B": [0] * 64}
+        self.attacked = {"W": 0, "B": 0}
+
+    @classmethod
+    def from_board(cls, board):
+        """
+        Function to build the Masks
+        with ChessBoard's Block grid
+        """
+        bits = cls()
+        for sq, pos in enumerate(POSITIONS):
+            piece = board[pos].piece
+            if piece is not None:
+                bits.put(sq, piece.team, piece.p_type, piece.is_start())
+        return bits
+
+    def copy(self):
+        bits = BitBoard.__new__(BitBoard)
+        bits.pieces = {"W": dict(self.pieces["W"]), "B": dict(self.pieces["B"])}
+        bits.teams = dict(self.teams)
+        bits.unmoved = self.unmoved
+        bits.squares = list(self.squares)
+        bits.reach = list(self.reach)
+        bits.counts = {"W": list(self.counts["W"]), "B": list(self.counts["B"])}
+        bits.attacked = dict(self.attacked)
+        return bits
+
+    def put(self, sq: int, team: str, p_type: str, is_start: bool = False):
+        """
+        Function to place a Piece on an empty Square
+        """
+        b = 1 << sq
+        masks = self.pieces[team]
+        masks[p_type] = masks.get(p_type, 0) | b
+        self.teams[team] |= b
+        if is_start:
+            self.unmoved |= b
+        self.squares[sq] = (team, p_type)
+        self.update(sq)
+        self.cover(sq, team, self.reach_of(sq, team, p_type))
+
+    def remove(self, sq: int):
+        """
+        Function to lift a Piece off its Square
+        """
+        team, p_type = self.squares[sq]
+        self.cover(sq, team, 0)
+        b = ~(1 << sq)
+        self.pieces[team][p_type] &= b
+        self.teams[team] &= b
+        self.unmoved &= b
+        self.squares[sq] = None
+        self.update(sq)
+
+    def reach_of(self, sq: int, team: str, p_type: str):
+        """
+        Function to get the Squares a Piece attacks from its Square,
+        up to and including the first Piece in the way
+        """
+        match p_type:
+            case "PA":
+                return PAWN_ATTACKS[team][sq]
+            case "KN":
+                return KNIGHT_ATTACKS[sq]
+            case "RO" | "BI" | "QU":
+                occupied = self.teams["W"] | self.teams["B"]
+                mask = 0
+                for d in SLIDES[p_type]:
+                    ray = RAYS[d][sq]
+                    blockers = ray & occupied
+                    if blockers:
+                        ray ^= RAYS[d][_nearest(blockers, d)]
+                    mask |= ray
+                return mask
+        return 0
+
+    def cover(self, sq: int, team: str, reach: int):
+        """
+        Function to replace the Reach of the Piece on the Square
+        and adjust the Team's attacker counts by the difference
+        """
+        old = self.reach[sq]
+        if old == reach:
+            return
+        counts = self.counts[team]
+        attacked = self.attacked[team]
+        for n in bit_squares(old & ~reach):
+            counts[n] -= 1
+            if not counts[n]:
+                attacked &= ~(1 << n)
+        for n in bit_squares(reach & ~old):
+            counts[n] += 1
+            attacked |= 1 << n
+        self.attacked[team] = attacked
+        self.reach[sq] = reach
+
+    def update(self, sq: int):
+        """
+        Function to refresh the Sliders whose Reach crosses a Square
+        after the Square was filled or emptied
+        """
+        for team in TEAMS:
+            masks = self.pieces[team]
+            sliders = masks.get("RO", 0) | masks.get("BI", 0) | masks.get("QU", 0)
+            for s in bit_squares(sliders):
+                if self.reach[s] >> sq & 1:
+                    self.cover(s, team, self.reach_of(s, team, self.squares[s][1]))
+
+    def reaches(self, sq: int):
+        """
+        Function to list the Positions the Piece on the Square attacks
+        """
+        return [POSITIONS[n] for n in bit_squares(self.reach[sq])]
+
+    def move(self, i_sq: int, n_sq: int, is_record: bool = False):
+        """
+        Function to move a Piece, capturing whatever stands on the new Square
+        Recorded moves keep the Piece's Initial Position flag like Piece.is_start does
+        """
+        team, p_type = self.squares[i_sq]
+        is_start = is_record and self.unmoved >> i_sq & 1
+        self.remove(i_sq)
+        if self.squares[n_sq] is not None:
+            self.remove(n_sq)
+        self.put(n_sq, team, p_type, is_start)
+
+    def slide(self, sq: int, team: str, p_type: str):
+        mask = []
+        occupied = self.teams["W"] | self.teams["B"]
+        own = self.teams[team]
+        for d in SLIDES[p_type]:
+            path = RAY_SQUARES[d][sq]
+            blockers = RAYS[d][sq] & occupied
+            if not blockers:
+                mask.extend(path)
+                continue
+            b = _nearest(blockers, d)
+            n = _distance(sq, b)
+            if own >> b & 1:
+                n -= 1
+            mask.extend(path[:n])
+        return mask
+
+    def pawn(self, sq: int, team: str):
+        x, y = POSITIONS[sq]
+        dx = 1 if team == "W" else -1
+        if not 0 <= x + dx < 8:
+            return []
+        mask = []
+        occupied = self.teams["W"] | self.teams["B"]
+        enemy = self.teams[OPPONENT[team]]
+        front = sq + dx * 8
+        if not occupied >> front & 1:
+            mask.append(POSITIONS[front])
+        for dy in (1, -1):
+            if 0 <= y + dy < 8 and enemy >> (front + dy) & 1:
+                mask.append(POSITIONS[front + dy])
+        if not occupied >> front & 1 and self.unmoved >> sq & 1 and 0 <= x + 2 * dx < 8:
+            if not occupied >> (front + dx * 8) & 1:
+                mask.append(POSITIONS[front + dx * 8])
+        return mask
+
+    def knight(self, sq: int, team: str):
+        own = self.teams[team]
+        return [pos for n, pos in KNIGHT_TARGETS[sq] if not own >> n & 1]
+
+    def is_attacked(self, sq: int, team: str, occupied: int):
+        """
+        Function to check if the Square is reached by any Piece of the Team
+        with the Occupancy to trace the Sliders through
+        """
+        masks = self.pieces[team]
+        if PAWN_ATTACKS[OPPONENT[team]][sq] & masks.get("PA", 0):
+            return True
+        if KNIGHT_ATTACKS[sq] & masks.get("KN", 0):
+            return True
+        if KING_GUARDS[sq] & masks.get("KI", 0):
+            return True
+        queens = masks.get("QU", 0)
+        lines = masks.get("RO", 0) | queens
+        diagonals = masks.get("BI", 0) | queens
+        for d in range(8):
+            attackers = lines if d < 4 else diagonals
+            if not attackers:
+                continue
+            blockers = RAYS[d][sq] & occupied
+            if blockers and attackers >> _nearest(blockers, d) & 1:
+                return True
+        return False
+
+    def king(self, sq: int, team: str):
+        x, y = POSITIONS[sq]
+        own = self.teams[team]
+        moves = list(DIRECTIONS)
+        # Checking for castling rule
+        if self.unmoved >> sq & 1:
+            rooks = self.pieces[team].get("RO", 0) & self.unmoved
+            row = x * 8
+            for r in bit_squares(rooks):
+                r &= 7
+                if r < y:
+                    if sum(1 for c in range(r + 1, y) if self.squares[row + c] is None) == 2:
+                        moves.append((0, -2))
+                elif sum(1 for c in range(y + 1, r) if self.squares[row + c] is None) == 3:
+                    moves.append((0, 2))
+
+        mask = []
+        occupied = (self.teams["W"] | self.teams["B"]) & ~(1 << sq)
+        enemy = OPPONENT[team]
+        attacked = self.attacked[enemy]
+        kings = self.pieces[enemy].get("KI", 0)
+        # Sliders reaching the King would see through its old Square, so look those up in full
+        in_check = attacked >> sq & 1
+        for d in moves:
+            nx, ny = x + d[0], y + d[1]
+            if not (0 <= nx < 8 and 0 <= ny < 8):
+                continue
+            n = nx * 8 + ny
+            if own >> n & 1:
+                continue
+            if in_check:
+                if self.is_attacked(n, enemy, occupied):
+                    continue
+            elif attacked >> n & 1 or KING_GUARDS[n] & kings:
+                continue
+            if d == (0, 2):
+                mask.append((nx, ny + 2))
+            elif d == (0, -2):
+                mask.append((nx, ny - 1))
+            else:
+                mask.append((nx, ny))
+        return mask
+
+    def moves(self, team: str):
+        """
+        Function to list every move of a Team in one pass
+        as flat From Square, To Square, Pawn Conversion code triples
+        """
+        flat = []
+        masks = self.pieces[team]
+        own, enemy = self.teams[team], self.teams[OPPONENT[team]]
+        empty = ~(own | enemy) & FULL
+        pawns = masks.get("PA", 0)
+        if pawns:
+            if team == "W":
+                single = pawns << 8 & empty
+                targets = ((single, 8), (((pawns & self.unmoved) << 8 & empty) << 8 & empty, 16),
+                           ((pawns & ~LAST_COLUMN) << 9 & enemy, 9), ((pawns & ~FIRST_COLUMN) << 7 & enemy, 7))
+            else:
+                single = pawns >> 8 & empty
+                targets = ((single, -8), (((pawns & self.unmoved) >> 8 & empty) >> 8 & empty, -16),
+                           ((pawns & ~LAST_COLUMN) >> 7 & enemy, -7), ((pawns & ~FIRST_COLUMN) >> 9 & enemy, -9))
+            for mask, shift in targets:
+                for n in bit_squares(mask):
+                    if END_ROWS >> n & 1:
+                        for code in range(1, len(PROMOTIONS) + 1):
+                            flat += (n - shift, n, code)
+                    else:
+                        flat += (n - shift, n, 0)
+        for s in bit_squares(masks.get("KN", 0)):
+            for n in bit_squares(KNIGHT_ATTACKS[s] & ~own):
+                flat += (s, n, 0)
+        for s in bit_squares(masks.get("RO", 0) | masks.get("BI", 0) | masks.get("QU", 0)):
+            for n in bit_squares(self.reach[s] & ~own):
+                flat += (s, n, 0)
+        for s in bit_squares(masks.get("KI", 0)):
+            for x, y in self.king(s, team):
+                flat += (s, x * 8 + y, 0)
+        return flat
+
+    def attackers(self, sq: int, team: str, occupied: int) -> int:
+        """
+        Function to get the Pieces of a Team attacking a Square by the rules of Chess,
+        with the Occupancy to trace the Sliders through
+        """
+        masks = self.pieces[team]
+        found = (PAWN_ATTACKS[OPPONENT[team]][sq] & masks.get("PA", 0) | KNIGHT_ATTACKS[sq] & masks.get("KN", 0)
+                 | KING_ATTACKS[sq] & masks.get("KI", 0))
+        queens = masks.get("QU", 0)
+        lines = masks.get("RO", 0) | queens
+        diagonals = masks.get("BI", 0) | queens
+        for d in range(8):
+            sliders = lines if d < 4 else diagonals
+            if not sliders:
+                continue
+            blockers = RAYS[d][sq] & occupied
+            if blockers:
+                b = _nearest(blockers, d)
+                if sliders >> b & 1:
+                    found |= 1 << b
+        return found
+
+    def checkers(self, team: str) -> int:
+        """
+        Function to get the enemy Pieces giving Check to a Team's King
+        """
+        king = self.pieces[team].get("KI", 0)
+        if not king:
+            return 0
+        return self.attackers(king.bit_length() - 1, OPPONENT[team], self.teams["W"] | self.teams["B"])
+
+    def pins(self, team: str, k: int):
+        """
+        Function to find the Pieces of a Team pinned to its King on Square k,
+        as Square -> the Squares it may still move to (along the pin, up to the pinner)
+        """
+        pins = {}
+        occupied = self.teams["W"] | self.teams["B"]
+        own = self.teams[team]
+        enemy = self.pieces[OPPONENT[team]]
+        queens = enemy.get("QU", 0)
+        lines = enemy.get("RO", 0) | queens
+        diagonals = enemy.get("BI", 0) | queens
+        for d in range(8):
+            sliders = lines if d < 4 else diagonals
+            ray = RAYS[d][k]
+            if not sliders & ray:
+                continue
+            blockers = ray & occupied
+            if not blockers:
+                continue
+            first = _nearest(blockers, d)
+            if not own >> first & 1:
+                continue
+            beyond = blockers & ~(1 << first) & RAYS[d][first]
+            if beyond:
+                second = _nearest(beyond, d)
+                if sliders >> second & 1:
+                    pins[first] = BETWEEN[k][second] | 1 << second
+        return pins
+
+    def legal(self, team: str):
+        """
+        Function to list only the legal moves of a Team by the rules of Chess
+        as flat From Square, To Square, Pawn Conversion code triples,
+        from the Checkers and pinned Pieces of the Position;
+        Castling is the King moving onto its own Rook, like ChessBoard.move takes it
+        """
+        masks = self.pieces[team]
+        king = masks.get("KI", 0)
+        if not king:
+            # Nothing to keep safe
+            return self.moves(team)
+        k = king.bit_length() - 1
+        enemy_team = OPPONENT[team]
+        own, enemy = self.teams[team], self.teams[enemy_team]
+        occupied = own | enemy
+        checkers = self.attackers(k, enemy_team, occupied)
+        flat = []
+        # The King may not step along a checking line, so trace the enemy through its old Square
+        beside = occupied & ~king
+        for n in bit_squares(KING_ATTACKS[k] & ~own):
+            if not self.attackers(n, enemy_team, beside):
+                flat += (k, n, 0)
+        if checkers & (checkers - 1):
+            # Double Check, only the King may move
+            return flat
+        if checkers:
+            c = checkers.bit_length() - 1
+            targets = checkers | BETWEEN[k][c]
+        else:
+            targets = FULL
+            flat += self.castles(team, k, occupied)
+        pins = self.pins(team, k)
+        empty = ~occupied & FULL
+        for s in bit_squares(masks.get("PA", 0)):
+            x = s >> 3
+            step = 8 if team == "W" else -8
+            reach = 0
+            front = s + step
+            if 0 <= front < 64:
+                if empty >> front & 1:
+                    reach |= 1 << front
+                    # Double step from the Team's Pawn row
+                    if x == (1 if team == "W" else 6) and empty >> (front + step) & 1:
+                        reach |= 1 << (front + step)
+                reach |= PAWN_ATTACKS[team][s] & enemy
+            reach &= targets & pins.get(s, FULL)
+            for n in bit_squares(reach):
+                if END_ROWS >> n & 1:
+                    for code in range(1, len(PROMOTIONS) + 1):
+                        flat += (s, n, code)
+                else:
+                    flat += (s, n, 0)
+        for s in bit_squares(masks.get("KN", 0)):
+            if s not in pins:
+                for n in bit_squares(KNIGHT_ATTACKS[s] & ~own & targets):
+                    flat += (s, n, 0)
+        for s in bit_squares(masks.get("RO", 0) | masks.get("BI", 0) | masks.get("QU", 0)):
+            for n in bit_squares(self.reach[s] & ~own & targets & pins.get(s, FULL)):
+                flat += (s, n, 0)
+        return flat
+
+    def castles(self, team: str, k: int, occupied: int):
+        """
+        Function to list the Castling moves of a King not on Check,
+        which may not pass through or land on an attacked Square
+        """
+        flat = []
+        row = 0 if team == "W" else 56
+        if k != row + 4 or not self.unmoved >> k & 1:
+            return flat
+        rooks = self.pieces[team].get("RO", 0) & self.unmoved
+        enemy = OPPONENT[team]
+        for rook, path in ((row + 7, (row + 5, row + 6)), (row, (row + 3, row + 2))):
+            if not rooks >> rook & 1 or BETWEEN[k][rook] & occupied:
+                continue
+            if not any(self.attackers(n, enemy, occupied) for n in path):
+                flat += (k, rook, 0)
+        return flat
+
+    def trace(self, sq: int):
+        """
+        Function to predict all possible moves of the Piece on the Square,
+        matching Prediction.trace_path
+        """
+        if self.squares[sq] is None:
+            return []
+        team, p_type = self.squares[sq]
+        match p_type:
+            case "PA":
+                return self.pawn(sq, team)
+            case "KN":
+                return self.knight(sq, team)
+            case "RO" | "BI" | "QU":
+                return self.slide(sq, team, p_type)
+            case "KI":
+                return self.king(sq, team)
+        return []
@@ -1,34 +1,78 @@
 import numpy as np
+from array import array
+from collections import OrderedDict
 from typing import Tuple, List
-from copy import deepcopy
-import time
+from BitBoard import BitBoard, KING_ATTACKS, POSITIONS, PROMOTIONS, square
+from Zobrist import SIDE, UNMOVED, CASTLERS, piece_keys, board_key
+from Evaluation import board_terms, shifted
+
+
+# Piece codes: Team in bit 3, Piece Type index below ("None" is a Conversion without a Type)
+TYPES = ("PA", "KN", "BI", "RO", "QU", "KI", "None")
+TYPE_CODES = {p_type: code for code, p_type in enumerate(TYPES)}
+TEAM_CODES = {"W": 0, "B": 8}
+# Square of a captured Piece in the PositionTable
+DEAD = -1
+# Ids of the Kings, the same on every Board
+KINGS = {"W": 4, "B": 28}
+# History entries are a packed move (Notation.pack_move) with these flags above it:
+# the Piece left its Initial Position, and the Check flags before the step
+MOVED_FIRST, W_CHECKED, B_CHECKED = 1 << 16, 1 << 17, 1 << 18
+# A Castling is one entry, the King moving onto its Rook like move() takes it,
+# with the Rook's first move flag beside the King's
+CASTLED, ROOK_FIRST = 1 << 19, 1 << 20
+# Conversion codes of the history, the PROMOTIONS ones first
+CONVERSIONS = {p_type: code for code, p_type in enumerate(PROMOTIONS + ("None", "PA", "KI"), 1)}
+CONVERSION_TYPES = {code: p_type for p_type, code in CONVERSIONS.items()}
+
+
+def fill(moves: np.ndarray, out: np.ndarray | None) -> np.ndarray:
+    """
+    Function to copy move rows into the first rows of a preallocated buffer,
+    checking it is a uint8 array of rows of 3 with room for them all
+    """
+    if out is None:
+        return moves
+    if not isinstance(out, np.ndarray) or out.ndim != 2 or out.shape[1] != 3 or out.dtype != np.uint8:
+        raise ValueError("out must be a uint8 array of shape (N, 3)")
+    if len(out) < len(moves):
+        raise ValueError(f"out has {len(out)} rows but there are {len(moves)} moves")
+    out[:len(moves)] = moves
+    return out[:len(moves)]
 
 
 class Piece:
     """
     Class to Represent Chess Piece
     with Team, Piece Type and Initial Position
+    and its id in the Board's PositionTable
     """
-    def __init__(self, team: str, p_type: str, i_pos: Tuple[int, int], r_id = None):
+    __slots__ = ("team", "p_type", "code", "moved", "id")
+
+    def __init__(self, team: str, p_type: str, i_pos: Tuple[int, int], r_id: int | None = None):
         self.team = team
         self.p_type = p_type
-        self.journey = [i_pos]
-        if r_id is None:
-            self.id = team + " " + p_type + " " + str(i_pos[1])
-        else:
-            self.id = r_id
+        self.code = TEAM_CODES[team] | TYPE_CODES[p_type]
+        self.moved = False
+        self.id = r_id
 
     def is_start(self):
         """
         Function to know if a Piece is at its Initial Position
         """
-        return True if len(self.journey) == 1 else False
+        return not self.moved
 
     def new_pos(self, pos: Tuple[int, int]):
         """
         Function to Record, Every new Step
+        The steps themselves are kept in the Board's history
         """
-        self.journey.append(pos)
+        self.moved = True
+
+    def copy(self):
+        piece = Piece.__new__(Piece)
+        piece.team, piece.p_type, piece.code, piece.moved, piece.id = self.team, self.p_type, self.code, self.moved, self.id
+        return piece
 
     def __repr__(self):
         return f"{self.team}: {self.p_type}"
@@ -39,6 +83,8 @@ class Block:
     Class to represent 1 out of 64 blocks on the Board
     with Piece object
     """
+    __slots__ = ("name", "piece")
+
     def __init__(self, comp: str | Piece):
         if isinstance(comp, str):
             self.name = comp
@@ -47,6 +93,11 @@ class Block:
             self.piece = comp 
             self.name = comp.team + comp.p_type
 
+    def copy(self):
+        block = Block.__new__(Block)
+        block.name, block.piece = self.name, None if self.piece is None else self.piece.copy()
+        return block
+
     def __repr__(self):
         if self.name != " ":
             return f"{self.piece.team}-{self.piece.p_type}"
@@ -54,16 +105,65 @@ class Block:
             return self.name
      
 
+class PositionTable:
+    """
+    Class to keep the Square of every Piece by its id (DEAD once captured)
+    in a byte array, with the name each id has in get_board
+    """
+    __slots__ = ("squares", "labels")
+
+    def __init__(self):
+        self.squares = array("b")
+        self.labels = []
+
+    def add(self, label: str, sq: int) -> int:
+        """
+        Function to give a new Piece the next id
+        """
+        self.squares.append(sq)
+        self.labels.append(label)
+        return len(self.labels) - 1
+
+    def pop(self):
+        self.squares.pop()
+        self.labels.pop()
+
+    def __getitem__(self, r_id: int):
+        """
+        Function to get the Position of a Piece, None once captured
+        """
+        sq = self.squares[r_id]
+        return POSITIONS[sq] if sq != DEAD else None
+
+    def copy(self):
+        table = PositionTable.__new__(PositionTable)
+        table.squares, table.labels = array("b", self.squares), list(self.labels)
+        return table
+
+    def as_dict(self):
+        return {label: POSITIONS[sq] if sq != DEAD else "DEAD" for label, sq in zip(self.labels, self.squares)}
+
+    def __len__(self):
+        return len(self.labels)
+
+
 class ChessBoard:
     """
     Class to represent Chess Board
+    with optional BitBoard backend for faster move generation
     """
-    def __init__(self):
+    def __init__(self, bitboard: bool = False, cache_size: int = 32):
         self.board = np.empty((8, 8), dtype=object)
-        self.snap_shots = []
-        self.all_pos_snaps = []
+        # Steps made while a snapshot is open, and where each snapshot starts
+        self.undo_stack = []
+        self.undo_marks = []
         self.is_b_on_check, self.is_w_on_check = False, False
         self.operator = False
+        # Team of the next move, flipped by every step
+        self.turn = "W"
+        # Every move of the game as one int, and the encoded start Position (None for the Initial one)
+        self.history = array("I")
+        self.origin = None
         for y in range(8):
             self.board[1, y] = Block(Piece("W", "PA", (1, y)))
             self.board[6, y] = Block(Piece("B", "PA", (6, y)))
@@ -86,23 +186,65 @@ class ChessBoard:
                 self.board[x, y] = Block(" ")
 
         # Keeping track of all Positions
-        self.all_pos, self.team_wise_id = dict(), list()
-        temp = []
+        self.all_pos, self.team_wise_id = PositionTable(), [[], []]
         for x in [0, 1, 6, 7]:
             for y in range(8):
-                block = self.board[x, y]
-                temp.append(block.piece.id)
-                self.all_pos[block.piece.id] = (x, y)
-            if x in [1, 7]:
-                self.team_wise_id.append(temp)
-                temp = []
+                piece = self.board[x, y].piece
+                piece.id = self.all_pos.add(piece.team + " " + piece.p_type + " " + str(y), x * 8 + y)
+                self.team_wise_id[0 if x < 2 else 1].append(piece.id)
+        self.bits = BitBoard.from_board(self.board) if bitboard else None
+        # Zobrist Key of the Position, kept up to date by shift and unshift
+        self.key = board_key(self)
+        # Evaluation terms of the Position, kept up to date the same way
+        self.terms = board_terms(self)
+        # Moves traced by Prediction, by Position and Square (None turns caching off),
+        # about one Position worth by default as past Positions are seldom traced again
+        self.traces = MoveCache(cache_size) if cache_size else None
+        # Squares whose Blocks a clone has copied for itself (None once it owns everything)
+        self.owned = None
+
+    def clone(self):
+        """
+        Function to fork the Board for another line of play,
+        sharing its Blocks, Pieces and tables with the fork until either Board changes them
+        """
+        if self.undo_marks:
+            raise ValueError("Cannot clone while a snapshot is open")
+        fork = ChessBoard.__new__(ChessBoard)
+        fork.__dict__.update(self.__dict__)
+        fork.undo_stack, fork.undo_marks = [], []
+        # Everything is shared now, this Board included; the traced moves stay shared for good
+        self.owned, fork.owned = set(), set()
+        return fork
+
+    def own(self, *squares: int):
+        """
+        Function to copy the shared Blocks a step is about to change,
+        and the shared tables on the first step after a clone
+        """
+        owned = self.owned
+        if not owned:
+            self.board = self.board.copy()
+            self.all_pos = self.all_pos.copy()
+            self.team_wise_id = [list(ids) for ids in self.team_wise_id]
+            self.history = array("I", self.history)
+            if self.bits is not None:
+                self.bits = self.bits.copy()
+        for sq in squares:
+            if sq not in owned:
+                pos = POSITIONS[sq]
+                self.board[pos] = self.board[pos].copy()
+                owned.add(sq)
+        if len(owned) == 64:
+            self.owned = None
 
     def move(self, i_pos: Tuple[int, int], n_pos: Tuple[int, int], is_record: bool = False, p_conv = "None"):
         """
         Function to move a Piece on the Board
         with Current and New Positions
         """
-        if is_record or self.is_b_on_check or self.is_w_on_check:
+        is_snap = is_record or self.is_b_on_check or self.is_w_on_check
+        if is_snap:
             self.snap_shot()
             if self.is_b_on_check or self.is_w_on_check:
                 self.operator = True
@@ -111,41 +253,31 @@ class ChessBoard:
         # Castling Operation
         if curr_block.piece.p_type == "KI" and (new_block.piece is not None and new_block.name in ["BRO", "WRO"]) and curr_block.piece.team == new_block.piece.team:
             if (curr_block.piece.team == "W" and not self.is_w_on_check) or (curr_block.piece.team == "B" and not self.is_b_on_check):
+                plies = len(self.history)
                 if n_pos[1] > i_pos[1]:
                     self.move(i_pos, (i_pos[0], i_pos[1] + 2))
                     self.move(n_pos, (n_pos[0], n_pos[1] - 2))
                 else:
                     self.move(i_pos, (i_pos[0], i_pos[1] - 2))
                     self.move(n_pos, (n_pos[0], n_pos[1] + 3))
+                self.castled(plies)
         else:
-            self.all_pos[curr_block.piece.id] = n_pos
-            if new_block.piece is not None:
-                self.all_pos[new_block.piece.id] = "DEAD"
-
-            if not is_record:
-                curr_block.piece.new_pos(n_pos)
-            new_block.piece = curr_block.piece
-            new_block.name = curr_block.name
-            curr_block.name = " "
-            curr_block.piece = None
-            # Pawn Conversion when reaching Opposite End!
-            if new_block.piece.p_type == "PA" and n_pos[0] in {0, 7}:
-                if p_conv is None:
-                    p_conv = "QU"
-                r_id = new_block.piece.team + " " + p_conv + " " + str(time.time())
-                new_block.piece = Piece(new_block.piece.team, p_conv, n_pos, r_id)
-                new_block.name = new_block.piece.team + new_block.piece.p_type
-                self.all_pos[r_id] = n_pos
-                if new_block.piece.team == "W":
-                    self.team_wise_id[0].append(r_id)
-                else:
-                    self.team_wise_id[1].append(r_id)
+            new_block = self.shift(i_pos, n_pos, is_record, p_conv)
 
             # For Check
             if not is_record:
-                new_mask = Prediction(self).trace_path(n_pos)
+                if self.bits is not None and new_block.piece.p_type != "KI":
+                    # Attack maps already hold every Square the Piece reaches
+                    new_mask = self.bits.reaches(square(n_pos))
+                else:
+                    new_mask = Prediction(self).trace_path(n_pos)
+                if self.bits is not None and new_block.piece.p_type == "KI":
+                    # Tracing a King on the Block grid tries its steps through move(),
+                    # which ends any pending validation, so do the same here
+                    if KING_ATTACKS[square(n_pos)] & ~self.bits.teams[new_block.piece.team]:
+                        self.operator = False
                 if self.board[n_pos[0], n_pos[1]].piece.team == "W":
-                    if self.all_pos["B KI 4"] in new_mask:
+                    if self.all_pos[KINGS["B"]] in new_mask:
                         # freeze all Blacks
                         self.is_b_on_check = True
                         # Checking for Mate
@@ -155,7 +287,7 @@ class ChessBoard:
                         # New adds to make self.operate as false even though if it's True
                         self.operator = False
                 else:
-                    if self.all_pos["W KI 4"] in new_mask:
+                    if self.all_pos[KINGS["W"]] in new_mask:
                         # freeze all whites
                         # not working from here
                         self.operator = False
@@ -170,75 +302,299 @@ class ChessBoard:
                     self.prev_cp()
             else:
                 if not is_record:
-                    self.snap_shots, self.all_pos_snaps = [], []
+                    self.commit()
                     if self.is_b_on_check:
                         self.is_b_on_check = False
                     if self.is_w_on_check:
                         self.is_w_on_check = False
             self.operator = False
+        elif is_snap and not is_record:
+            # Check validation was called off by a new check, so keep the move,
+            # which also ends the Check of the Team that made it
+            self.commit()
+            if self.turn == "B":
+                self.is_w_on_check = False
+            else:
+                self.is_b_on_check = False
 
     def is_under_attack(self):
         """
         Function to check if king is under attack after moving a piece
         """
+        cap_piece, check = (self.all_pos[KINGS["B"]], 0) if self.is_b_on_check else (self.all_pos[KINGS["W"]], 1)
+        if self.bits is not None:
+            if cap_piece is None:
+                return False
+            return bool(self.bits.attacked["W" if check == 0 else "B"] >> square(cap_piece) & 1)
         p = Prediction(self)
-        cap_piece, check = (self.all_pos["B KI 4"], 0) if self.is_b_on_check else (self.all_pos["W KI 4"], 1)
+        squares = self.all_pos.squares
+        king = KINGS["W" if check == 0 else "B"]
         for key in self.team_wise_id[check]:
-            if "KI" in key.split():
+            if key == king:
                 # For King Piece we have spl validation to check the safety of the Piece
                 # So we don't have to do it again.
                 continue
-            if self.all_pos[key] != "DEAD" and cap_piece in p.trace_path(self.all_pos[key]):
+            if squares[key] != DEAD and cap_piece in p.trace_path(POSITIONS[squares[key]]):
                 return True
         return False
 
-    def is_mate(self, team: str, a_piece_pos: Tuple[int, int]):
+    def is_mate(self, team: str, a_piece_pos: Tuple[int, int] | None = None):
         """
         Function to check for the Mate
+        from the legal moves of the Team, whichever Pieces give the Check
         """
-        p = Prediction(self)
-        # Checking to Move the King Piece
-        if len(p.trace_path(self.all_pos[team + " KI 4"])) != 0:
-            return False
+        return self.status(team) == "checkmate"
+
+    def shift(self, i_pos: Tuple[int, int], n_pos: Tuple[int, int], is_record: bool = False, p_conv = "None"):
+        """
+        Function to carry a Piece to its New Position, capturing and converting Pawns,
+        and to record the step while a snapshot is open
+        """
+        i_sq, n_sq = square(i_pos), square(n_pos)
+        if self.owned is not None:
+            self.own(i_sq, n_sq)
+        curr_block, new_block = self.board[i_pos[0], i_pos[1]], self.board[n_pos[0], n_pos[1]]
+        piece, captured, promoted = curr_block.piece, new_block.piece, None
+        state = (self.is_b_on_check, self.is_w_on_check, self.key, self.turn, self.terms)
+        keys = piece_keys(piece.team, piece.p_type)
+        key = self.key ^ keys[i_sq] ^ keys[n_sq]
+        if piece.p_type in CASTLERS and piece.is_start():
+            key ^= UNMOVED[i_sq]
+        self.all_pos.squares[piece.id] = n_sq
+        if captured is not None:
+            self.all_pos.squares[captured.id] = DEAD
+            key ^= piece_keys(captured.team, captured.p_type)[n_sq]
+            if captured.p_type in CASTLERS and captured.is_start():
+                key ^= UNMOVED[n_sq]
+
+        was_start = piece.is_start()
+        if not is_record:
+            piece.new_pos(n_pos)
+        elif piece.p_type in CASTLERS and piece.is_start():
+            key ^= UNMOVED[n_sq]
+        if self.bits is not None:
+            self.bits.move(i_sq, n_sq, is_record)
+        new_block.piece = piece
+        new_block.name = curr_block.name
+        curr_block.name = " "
+        curr_block.piece = None
+        # Pawn Conversion when reaching Opposite End!
+        if piece.p_type == "PA" and n_pos[0] in {0, 7}:
+            if p_conv is None:
+                p_conv = "QU"
+            # Named after its id, so replaying a game gives the same names
+            r_id = self.all_pos.add(piece.team + " " + p_conv + " " + str(len(self.all_pos)), n_sq)
+            # The Pawn leaves the game, unshift puts it back on its Square
+            self.all_pos.squares[piece.id] = DEAD
+            promoted = Piece(piece.team, p_conv, n_pos, r_id)
+            new_block.piece = promoted
+            new_block.name = promoted.team + promoted.p_type
+            key ^= keys[n_sq] ^ piece_keys(promoted.team, p_conv)[n_sq]
+            if p_conv in CASTLERS:
+                key ^= UNMOVED[n_sq]
+            if self.bits is not None:
+                self.bits.remove(n_sq)
+                self.bits.put(n_sq, promoted.team, p_conv, True)
+            if promoted.team == "W":
+                self.team_wise_id[0].append(r_id)
+            else:
+                self.team_wise_id[1].append(r_id)
+
+        if not is_record:
+            self.history.append(i_sq | n_sq << 6 | (0 if promoted is None else CONVERSIONS[promoted.p_type]) << 12
+                                | (MOVED_FIRST if was_start else 0)
+                                | (W_CHECKED if self.is_w_on_check else 0) | (B_CHECKED if self.is_b_on_check else 0))
+        self.terms = shifted(self.terms, piece.team, piece.p_type, i_sq, n_sq,
+                             None if captured is None else (captured.team, captured.p_type),
+                             None if promoted is None else promoted.p_type)
+        turn = "B" if piece.team == "W" else "W"
+        if turn != self.turn:
+            key ^= SIDE
+            self.turn = turn
+        self.key = key
+        if self.undo_marks:
+            self.undo_stack.append((i_pos, n_pos, piece, captured, promoted, is_record, state))
+        return new_block
+
+    def unshift(self, i_pos: Tuple[int, int], n_pos: Tuple[int, int], piece: Piece, captured: Piece | None,
+                promoted: Piece | None, is_record: bool, state: Tuple[bool, bool, int, str, tuple]):
+        """
+        Function to take back a step recorded by shift
+        """
+        curr_block, new_block = self.board[i_pos[0], i_pos[1]], self.board[n_pos[0], n_pos[1]]
+        if promoted is not None:
+            self.all_pos.pop()
+            self.team_wise_id[0 if promoted.team == "W" else 1].pop()
+        if not is_record:
+            entry = self.history.pop()
+            if entry & CASTLED:
+                # The Rook's step goes first, the King's step is left for its own unshift
+                i_sq, r_sq = entry & 63, entry >> 6 & 63
+                self.history.append(i_sq | (i_sq + 2 if r_sq > i_sq else i_sq - 2) << 6
+                                    | entry & (MOVED_FIRST | W_CHECKED | B_CHECKED))
+                if entry & ROOK_FIRST:
+                    piece.moved = False
+            elif entry & MOVED_FIRST:
+                piece.moved = False
+        curr_block.piece = piece
+        curr_block.name = piece.team + piece.p_type
+        self.all_pos.squares[piece.id] = square(i_pos)
+        new_block.piece = captured
+        if captured is None:
+            new_block.name = " "
         else:
-            # Checking to Remove the attacking Piece
-            for i in self.team_wise_id[0 if team == "W" else 1]:
-                if self.all_pos[i] != "DEAD":
-                    if a_piece_pos in p.trace_path(self.all_pos[i]):
-                        return False
-            # Checking to Block the Way
-            if self.board[a_piece_pos[0], a_piece_pos[1]].piece.p_type == "KN":
-                return True
-            a_piece_mask = p.trace_path(a_piece_pos)
-            z = [(0, 1), (0, -1), (1, 0), (-1, 0), (1, 1), (-1, -1), (1, -1), (-1, 1)]
-            for i in z:
-                m1 = self.all_pos[team + " KI 4"] + i
-                if m1 in a_piece_mask:
-                    break
-            for i in self.team_wise_id[0 if team == "W" else 1]:
-                if self.all_pos[i] != "DEAD":
-                    if m1 in p.trace_path(self.all_pos[i]):
-                        return False
-            return True
+            new_block.name = captured.team + captured.p_type
+            self.all_pos.squares[captured.id] = square(n_pos)
+        if self.bits is not None:
+            self.bits.remove(square(n_pos))
+            self.bits.put(square(i_pos), piece.team, piece.p_type, piece.is_start())
+            if captured is not None:
+                self.bits.put(square(n_pos), captured.team, captured.p_type, captured.is_start())
+        self.is_b_on_check, self.is_w_on_check, self.key, self.turn, self.terms = state
 
     def snap_shot(self):
         """
         Function to record Past Snapshots
         For checking the King's Safe Position
         """
-        temp = deepcopy(self.board)
-        self.snap_shots.append(temp)
-        self.all_pos_snaps.append(deepcopy(self.all_pos))
+        self.undo_marks.append(len(self.undo_stack))
+
+    def commit(self):
+        """
+        Function to drop the last snapshot and keep the steps made since,
+        which stay recorded for any snapshot opened before it
+        """
+        self.undo_marks.pop()
+        if not self.undo_marks:
+            self.undo_stack.clear()
 
     def prev_cp(self):
         """
         Function to restore to previous snapshot
+        by taking back every step made since
+        """
+        mark = self.undo_marks.pop()
+        while len(self.undo_stack) > mark:
+            self.unshift(*self.undo_stack.pop())
+
+    def castled(self, plies: int):
+        """
+        Function to keep the two steps of a Castling made after the first plies of the history
+        as one entry, the King moving onto its Rook
         """
-        self.board = deepcopy(self.snap_shots.pop())
-        self.all_pos = deepcopy(self.all_pos_snaps.pop())
+        if len(self.history) != plies + 2:
+            return
+        rook, king = self.history.pop(), self.history.pop()
+        self.history.append(king & ~(63 << 6) | (rook & 63) << 6 | CASTLED | (ROOK_FIRST if rook & MOVED_FIRST else 0))
+
+    def take_back(self, ply: int):
+        """
+        Function to take the game back to before a move of its history,
+        by replaying the moves before it on the start Position
+        """
+        if self.undo_marks:
+            raise ValueError("Cannot take back while a snapshot is open")
+        if not 0 <= ply <= len(self.history):
+            raise ValueError(f"No ply {ply} in a history of {len(self.history)} moves")
+        if ply == len(self.history):
+            return
+        steps, entry = self.history[:ply], self.history[ply]
+        if self.origin is None:
+            start = ChessBoard(self.bits is not None)
+        else:
+            # Notation builds on this module
+            from Notation import decode
+            start = decode(self.origin, self.bits is not None)
+        traces = self.traces
+        self.__dict__.update(start.__dict__)
+        self.traces = traces
+        for step in steps:
+            # Check flags are part of each entry, so the replayed history is the same
+            self.is_w_on_check, self.is_b_on_check = bool(step & W_CHECKED), bool(step & B_CHECKED)
+            i_pos, n_pos = POSITIONS[step & 63], POSITIONS[step >> 6 & 63]
+            if step & CASTLED:
+                plies = len(self.history)
+                self.shift(i_pos, (i_pos[0], i_pos[1] + 2 if n_pos[1] > i_pos[1] else i_pos[1] - 2))
+                self.shift(n_pos, (n_pos[0], n_pos[1] - 2 if n_pos[1] > i_pos[1] else n_pos[1] + 3))
+                self.castled(plies)
+                continue
+            code = step >> 12 & 15
+            self.shift(i_pos, n_pos, p_conv=CONVERSION_TYPES[code] if code else None)
+        self.is_w_on_check, self.is_b_on_check = bool(entry & W_CHECKED), bool(entry & B_CHECKED)
+
+    def packed_history(self) -> np.ndarray:
+        """
+        Function to export the history as packed moves (Notation.pack_move),
+        Castling as the King onto its Rook, without copying it move by move
+        """
+        return (np.frombuffer(self.history, dtype=f"u{self.history.itemsize}") & 0xFFFF).astype(np.uint16)
+
+    def legal_moves(self, team: str | None = None, out: np.ndarray | None = None):
+        """
+        Function to list every move of a Team (the side to move by default) in one pass
+        as rows of From Square, To Square and Pawn Conversion code (PROMOTIONS index + 1, 0 for none)
+        into a new array, or into the first rows of a preallocated uint8 buffer
+        """
+        team = self.turn if team is None else team
+        if self.bits is not None:
+            flat = self.bits.moves(team)
+        else:
+            flat = []
+            p = Prediction(self)
+            for key in list(self.team_wise_id[0 if team == "W" else 1]):
+                pos = self.all_pos[key]
+                if pos is None:
+                    continue
+                piece = self.board[pos].piece
+                i_sq = square(pos)
+                for n_pos in p.trace_path(pos):
+                    n_sq = square(n_pos)
+                    if piece.p_type == "PA" and n_pos[0] in {0, 7}:
+                        for code in range(1, len(PROMOTIONS) + 1):
+                            flat += (i_sq, n_sq, code)
+                    else:
+                        flat += (i_sq, n_sq, 0)
+        moves = np.frombuffer(bytearray(flat), dtype=np.uint8).reshape(-1, 3)
+        return fill(moves, out)
+
+    def strict_moves(self, team: str | None = None, out: np.ndarray | None = None):
+        """
+        Function to list only the moves of a Team (the side to move by default) legal by the rules of Chess,
+        from its Checkers and pinned Pieces, as legal_moves rows
+        Castling is the King moving onto its own Rook, like move() takes it
+        """
+        team = self.turn if team is None else team
+        bits = self.bits if self.bits is not None else BitBoard.from_board(self.board)
+        moves = np.frombuffer(bytearray(bits.legal(team)), dtype=np.uint8).reshape(-1, 3)
+        return fill(moves, out)
+
+    def status(self, team: str | None = None):
+        """
+        Function to tell if a Team (the side to move by default) is on Check, Checkmated or Stalemated,
+        as "check", "checkmate", "stalemate" or None
+        """
+        team = self.turn if team is None else team
+        bits = self.bits if self.bits is not None else BitBoard.from_board(self.board)
+        on_check = bits.checkers(team) != 0
+        if bits.legal(team):
+            return "check" if on_check else None
+        return "checkmate" if on_check else "stalemate"
+
+    def rook(self, r_id: int):
+        """
+        Function to get the Column of a Rook still at its Initial Position,
+        None for any other id
+        """
+        sq = self.all_pos.squares[r_id]
+        if sq == DEAD:
+            return None
+        piece = self.board[POSITIONS[sq]].piece
+        if piece.p_type != "RO" or not piece.is_start():
+            return None
+        return sq & 7
 
     def get_board(self):
-        return self.all_pos
+        return self.all_pos.as_dict()
 
     def robo_move(self, i_pos: Tuple[int, int], n_pos: Tuple[int, int], p_conv = "None"):
         """
@@ -250,35 +606,16 @@ class ChessBoard:
         # Castling Operation
         if curr_block.piece.p_type == "KI" and (new_block.piece is not None and new_block.name in ["BRO", "WRO"]) and curr_block.piece.team == new_block.piece.team:
             if (curr_block.piece.team == "W" and not self.is_w_on_check) or (curr_block.piece.team == "B" and not self.is_b_on_check):
+                plies = len(self.history)
                 if n_pos[1] > i_pos[1]:
                     self.move(i_pos, (i_pos[0], i_pos[1] + 2))
                     self.move(n_pos, (n_pos[0], n_pos[1] - 2))
                 else:
                     self.move(i_pos, (i_pos[0], i_pos[1] - 2))
                     self.move(n_pos, (n_pos[0], n_pos[1] + 3))
+                self.castled(plies)
         else:
-            self.all_pos[curr_block.piece.id] = n_pos
-            if new_block.piece is not None:
-                self.all_pos[new_block.piece.id] = "DEAD"
-
-            curr_block.piece.new_pos(n_pos)
-            new_block.piece = curr_block.piece
-            new_block.name = curr_block.name
-            curr_block.name = " "
-            curr_block.piece = None
-            # Pawn Conversion when reaching Opposite End!
-            if new_block.piece.p_type == "PA" and n_pos[0] in {0, 7}:
-                if p_conv is None:
-                    p_conv = "QU"
-                r_id = new_block.piece.team + " " + p_conv + " " + str(time.time())
-                new_block.piece = Piece(new_block.piece.team, p_conv, n_pos, r_id)
-                new_block.name = new_block.piece.team + new_block.piece.p_type
-                self.all_pos[r_id] = n_pos
-                if new_block.piece.team == "W":
-                    self.team_wise_id[0].append(r_id)
-                else:
-                    self.team_wise_id[1].append(r_id)
-
+            self.shift(i_pos, n_pos, p_conv=p_conv)
 
     def __repr__(self):
         for x in range(0, 8):
@@ -288,6 +625,45 @@ class ChessBoard:
         return ''
 
 
+class MoveCache:
+    """
+    Class to keep the moves traced from the Squares of recent Positions,
+    dropping the least recently used beyond its size
+    """
+    def __init__(self, size: int = 32):
+        self.size = size
+        self.entries = OrderedDict()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        moves = self.entries.get(key)
+        if moves is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return moves
+
+    def put(self, key, moves):
+        self.entries[key] = moves
+        # An overwritten key keeps its old place in the order unless moved
+        self.entries.move_to_end(key)
+        if len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "hit_rate": self.hits / lookups if lookups else 0.0}
+
+    def __len__(self):
+        return len(self.entries)
+
+
 class Prediction:
     """
     Class to predict Moves of a Piece
@@ -316,8 +692,34 @@ class Prediction:
     def trace_path(self, pos: Tuple[int, int]):
         """
         Function to predict all possible moves of a Piece
+        with Current Position of the Piece, from the Board's cache when it has them
+        Entries are keyed by the Position, so a changed Board never finds stale ones
+        """
+        board = self.board
+        cache = board.traces
+        # Positions under a snapshot are tried and taken back, so only the Board's own Position is worth keeping
+        if cache is None or board.undo_marks:
+            return self.trace(pos)
+        # The Zobrist Key covers the Pieces, Castling flags and the Team to move;
+        # Check flags change what a King may do, and Castling reads Rooks by id
+        key = (board.key, board.is_w_on_check, board.is_b_on_check, len(board.all_pos), pos)
+        # Tracing a King on the Block grid ends any pending validation through move(), so do it for real then
+        piece = board.board[pos[0], pos[1]].piece
+        if not (board.operator and board.bits is None and piece is not None and piece.p_type == "KI"):
+            mask = cache.get(key)
+            if mask is not None:
+                return list(mask)
+        mask = self.trace(pos)
+        cache.put(key, tuple(mask))
+        return mask
+
+    def trace(self, pos: Tuple[int, int]):
+        """
+        Function to work out all possible moves of a Piece
         with Current Position of the Piece
         """
+        if self.board.bits is not None:
+            return self.board.bits.trace(square(pos))
         curr_block = self.board.board[pos[0], pos[1]]
         piece = curr_block.piece
         mask = []
@@ -390,8 +792,9 @@ class Prediction:
                 # Checking for castling rule
                 if piece.team == "W" and piece.is_start():
                     for key in self.board.team_wise_id[0]:
-                        if 'RO' in key.split() and self.board.all_pos[key] != "DEAD" and self.board.board[self.board.all_pos[key]].piece.is_start():
-                            bi_pos = int(key.split()[2])
+                        rook = self.board.rook(key)
+                        if rook is not None:
+                            bi_pos = rook
                             temp = 0
                             if bi_pos < pos[1]:
                                 for y in range(bi_pos + 1, pos[1]):
@@ -407,8 +810,9 @@ class Prediction:
                                     moves.append((0, 2))
                 if piece.team == "B" and piece.is_start():
                     for key in self.board.team_wise_id[1]:
-                        if 'RO' in key.split() and self.board.all_pos[key] != "DEAD" and self.board.board[self.board.all_pos[key]].piece.is_start():
-                            bi_pos = int(key.split()[2])
+                        rook = self.board.rook(key)
+                        if rook is not None:
+                            bi_pos = rook
                             temp = 0
                             if bi_pos < pos[1]:
                                 for y in range(bi_pos + 1, pos[1]):
@@ -431,9 +835,9 @@ class Prediction:
                         count = 0
                         if piece.team == "W":
                             for key in self.board.team_wise_id[1]:
-                                if self.board.all_pos[key] == "DEAD":
+                                if self.board.all_pos[key] is None:
                                     count += 1
-                                elif key == "B KI 4":
+                                elif key == KINGS["B"]:
                                     dis = abs(n_pos[0] - self.board.all_pos[key][0]) + abs(n_pos[1] - self.board.all_pos[key][1])
                                     if dis > 1:
                                         count += 1
@@ -448,9 +852,9 @@ class Prediction:
                                         mask.append(n_pos)
                         else:
                             for key in self.board.team_wise_id[0]:
-                                if self.board.all_pos[key] == "DEAD":
+                                if self.board.all_pos[key] is None:
                                     count += 1
-                                elif key == "W KI 4":
+                                elif key == KINGS["W"]:
                                     dis = abs(n_pos[0] - self.board.all_pos[key][0]) + abs(n_pos[1] - self.board.all_pos[key][1])
                                     if dis > 1:
                                         count += 1
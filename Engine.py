@@ -0,0 +1,276 @@
+"""
+Iterative deepening alpha-beta search choosing moves for ChessBoard.robo_move,
+with a Transposition Table, move ordering, quiescence search and a time or node budget
+
+Usage: python Engine.py [--fen FEN] [--depth N] [--movetime SECONDS] [--nodes N] [--grid]
+"""
+import argparse
+import time
+from typing import Tuple
+
+from BitBoard import POSITIONS, PROMOTIONS
+from ChessBoard import ChessBoard, DEAD, KINGS
+from Evaluation import score
+from Zobrist import TranspositionTable
+
+
+VALUES = {"PA": 100, "KN": 320, "BI": 330, "RO": 500, "QU": 900, "KI": 20000, "None": 0}
+MATE = 100000
+# Scores this close to MATE count the moves to Mate
+MATE_BOUND = MATE - 1000
+EXACT, LOWER, UPPER = 0, 1, 2
+# Quiescence plies that still answer a Check with every move; a Check that both sides
+# keep on (move() lets a checked side give Check back) would never end otherwise
+CHECK_PLIES = 4
+
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search once its budget is spent
+    """
+
+
+def piece_at(board: ChessBoard, sq: int):
+    """
+    Function to get the Team and Piece Type on a Square, or None
+    """
+    if board.bits is not None:
+        return board.bits.squares[sq]
+    piece = board.board[POSITIONS[sq]].piece
+    return None if piece is None else (piece.team, piece.p_type)
+
+
+def evaluate(board: ChessBoard) -> int:
+    """
+    Function to score a Position in centipawns for the side to move,
+    from the evaluation terms the Board keeps up to date
+    """
+    return score(board.terms, board.turn)
+
+
+def is_on_check(board: ChessBoard, team: str) -> bool:
+    return board.is_w_on_check if team == "W" else board.is_b_on_check
+
+
+class Engine:
+    """
+    Class to search ChessBoard Positions for the best move,
+    keeping its Transposition Table between searches
+    """
+    def __init__(self, table_size: int = 1 << 18):
+        self.table = TranspositionTable(table_size, "depth")
+        self.killers = []
+        self.nodes = 0
+        self.limit = None
+        self.deadline = None
+        self.can_abort = False
+
+    def count(self):
+        """
+        Function to count a node and stop the search
+        once the node or time budget is spent
+        """
+        self.nodes += 1
+        if self.can_abort:
+            if self.limit is not None and self.nodes >= self.limit:
+                raise SearchAborted()
+            if self.deadline is not None and not self.nodes & 255 and time.perf_counter() >= self.deadline:
+                raise SearchAborted()
+
+    @staticmethod
+    def make(board: ChessBoard, move: Tuple[int, int, int]) -> bool:
+        """
+        Function to play a move under a snapshot,
+        returning False (and taking it back) if move() refused it
+        """
+        i_sq, n_sq, code = move
+        team = board.turn
+        board.snap_shot()
+        board.move(POSITIONS[i_sq], POSITIONS[n_sq], p_conv=PROMOTIONS[code - 1] if code else None)
+        # move() restores the board itself when the move leaves the King attacked
+        if board.turn == team:
+            board.prev_cp()
+            return False
+        return True
+
+    def order(self, board: ChessBoard, moves: list, best: Tuple[int, int, int] | None, ply: int):
+        """
+        Function to sort moves with the Table's best move first,
+        then captures by most valuable victim and least valuable attacker,
+        Pawn Conversions, and the killer moves of the ply
+        """
+        killers = self.killers[ply] if ply < len(self.killers) else ()
+        scored = []
+        for move in moves:
+            i_sq, n_sq, code = move
+            if move == best:
+                score = 1 << 30
+            else:
+                score = 0
+                victim = piece_at(board, n_sq)
+                if victim is not None:
+                    score = 1 << 20 | 16 * VALUES[victim[1]] - VALUES[piece_at(board, i_sq)[1]] // 10
+                if code == 1:
+                    score += 1 << 19
+                elif move in killers:
+                    score += 1 << 18
+            scored.append((score, move))
+        scored.sort(key=lambda item: item[0], reverse=True)
+        return [move for _, move in scored]
+
+    def key(self, board: ChessBoard) -> int:
+        # Check flags change which moves move() accepts, so they are part of the Position
+        return board.key | board.is_w_on_check << 64 | board.is_b_on_check << 65
+
+    def quiesce(self, board: ChessBoard, alpha: int, beta: int, ply: int, q_ply: int = 0) -> int:
+        """
+        Function to search captures and Pawn Conversions (every move while on Check)
+        until the Position is quiet
+        """
+        team = board.turn
+        if board.all_pos.squares[KINGS[team]] == DEAD:
+            return -MATE + ply
+        self.count()
+        on_check = is_on_check(board, team) and q_ply < CHECK_PLIES
+        moves = board.strict_moves().tolist()
+        if not on_check:
+            stand = evaluate(board)
+            if stand >= beta:
+                return stand
+            alpha = max(alpha, stand)
+            moves = [move for move in moves if move[2] == 1 or piece_at(board, move[1]) is not None]
+        legal = 0
+        for move in self.order(board, moves, None, ply):
+            if not self.make(board, move):
+                continue
+            legal += 1
+            try:
+                score = -self.quiesce(board, -beta, -alpha, ply + 1, q_ply + 1)
+            finally:
+                board.prev_cp()
+            if score > alpha:
+                alpha = score
+                if alpha >= beta:
+                    break
+        if on_check and not legal:
+            return -MATE + ply
+        return alpha
+
+    def alpha_beta(self, board: ChessBoard, depth: int, alpha: int, beta: int, ply: int, pv: list) -> int:
+        """
+        Function to score a Position by negamax alpha-beta search to a depth,
+        filling the principal variation
+        """
+        team = board.turn
+        if board.all_pos.squares[KINGS[team]] == DEAD:
+            return -MATE + ply
+        if depth <= 0:
+            return self.quiesce(board, alpha, beta, ply)
+        self.count()
+        key = self.key(board)
+        entry = self.table.probe(key)
+        best_move = None
+        if entry is not None:
+            score, flag, best_move = entry
+            # Mate scores are stored relative to the Position, not the root
+            if score > MATE_BOUND:
+                score -= ply
+            elif score < -MATE_BOUND:
+                score += ply
+            if ply > 0 and self.table.depth(key) >= depth and (
+                    flag == EXACT or (flag == LOWER and score >= beta) or (flag == UPPER and score <= alpha)):
+                return score
+        start_alpha = alpha
+        best, legal = -MATE - 1, 0
+        for move in self.order(board, board.strict_moves().tolist(), best_move, ply):
+            if not self.make(board, move):
+                continue
+            legal += 1
+            line = []
+            try:
+                score = -self.alpha_beta(board, depth - 1, -beta, -alpha, ply + 1, line)
+            finally:
+                board.prev_cp()
+            if score > best:
+                best, best_move = score, move
+                if score > alpha:
+                    alpha = score
+                    pv[:] = [move] + line
+                    if alpha >= beta:
+                        if piece_at(board, move[1]) is None:
+                            while len(self.killers) <= ply:
+                                self.killers.append([])
+                            if move not in self.killers[ply]:
+                                self.killers[ply] = [move] + self.killers[ply][:1]
+                        break
+        if not legal:
+            # Check flags miss discovered Checks, so ask the Board which way the game ended
+            return -MATE + ply if board.status(team) == "checkmate" else 0
+        flag = EXACT if start_alpha < best < beta else LOWER if best >= beta else UPPER
+        stored = best + ply if best > MATE_BOUND else best - ply if best < -MATE_BOUND else best
+        self.table.store(key, (stored, flag, best_move), depth)
+        return best
+
+    def search(self, board: ChessBoard, depth: int = 64, movetime: float | None = None, nodes: int | None = None):
+        """
+        Function to find the best move by iterative deepening
+        until the depth, time (seconds) or node budget runs out
+        Depth 1 always completes, so there is a move whenever one is legal
+        Returns the move and principal variation as (Current Position, New Position, Pawn Conversion),
+        the score for the side to move, the depth reached, nodes and nodes per second
+        """
+        start = time.perf_counter()
+        self.nodes, self.limit = 0, nodes
+        self.deadline = start + movetime if movetime is not None else None
+        self.killers = []
+        result = {"move": None, "pv": [], "score": 0, "depth": 0}
+        for d in range(1, depth + 1):
+            self.can_abort = d > 1
+            pv = []
+            try:
+                score = self.alpha_beta(board, d, -MATE - 1, MATE + 1, 0, pv)
+            except SearchAborted:
+                break
+            result.update(pv=pv, score=score, depth=d)
+            if abs(score) > MATE_BOUND:
+                break
+        self.can_abort = False
+        elapsed = time.perf_counter() - start
+        result["pv"] = [(POSITIONS[i_sq], POSITIONS[n_sq], PROMOTIONS[code - 1] if code else None)
+                        for i_sq, n_sq, code in result["pv"]]
+        result["move"] = result["pv"][0] if result["pv"] else None
+        result.update(nodes=self.nodes, time=elapsed, nps=self.nodes / elapsed if elapsed else 0.0)
+        return result
+
+    def play(self, board: ChessBoard, depth: int = 64, movetime: float | None = None, nodes: int | None = None):
+        """
+        Function to search and play the best move through robo_move
+        robo_move places the Piece without the Check bookkeeping of move(),
+        so the Check flags are set afterwards like move() would
+        """
+        result = self.search(board, depth, movetime, nodes)
+        if result["move"] is not None:
+            team = board.turn
+            board.robo_move(*result["move"])
+            # Leaving Check is what made the move legal, so only the opponent can be on Check now
+            board.is_w_on_check, board.is_b_on_check = team == "B", team == "W"
+            on_check = board.is_under_attack()
+            board.is_w_on_check, board.is_b_on_check = on_check and team == "B", on_check and team == "W"
+        return result
+
+
+if __name__ == "__main__":
+    from Notation import LETTERS, START, from_fen
+
+    parser = argparse.ArgumentParser(description="Search a Position for the best move")
+    parser.add_argument("--fen", default=START)
+    parser.add_argument("--depth", type=int, default=64)
+    parser.add_argument("--movetime", type=float, default=1.0)
+    parser.add_argument("--nodes", type=int)
+    parser.add_argument("--grid", action="store_true", help="use the Block grid instead of the BitBoard")
+    args = parser.parse_args()
+    result = Engine().search(from_fen(args.fen, not args.grid), args.depth, args.movetime, args.nodes)
+    print(f"depth {result['depth']}  score {result['score']}  nodes {result['nodes']}  "
+          f"nps {result['nps']:.0f}  time {result['time']:.3f}s")
+    print("pv", " ".join(f"{chr(97 + i[1])}{i[0] + 1}{chr(97 + n[1])}{n[0] + 1}{LETTERS[p] if p else ''}"
+                         for i, n, p in result["pv"]))
@@ -0,0 +1,209 @@
+"""
+Incremental tapered evaluation: material, piece-square tables and Pawn structure,
+kept by ChessBoard as a small tuple of terms that shift() updates by deltas and unshift() restores
+
+Terms are (middlegame, endgame, phase, pawn files), the scores counted for White.
+Pawn files hold the number of Pawns of each Team on each column, 4 bits each,
+and the doubled and isolated Pawn penalties of a set of files are looked up in a cache.
+"""
+from typing import Tuple
+
+from BitBoard import POSITIONS
+
+
+MG_VALUES = {"PA": 82, "KN": 337, "BI": 365, "RO": 477, "QU": 1025, "KI": 0, "None": 0}
+EG_VALUES = {"PA": 94, "KN": 281, "BI": 297, "RO": 512, "QU": 936, "KI": 0, "None": 0}
+# Game phase left by each Piece, 24 with every Piece on the Board
+PHASES = {"PA": 0, "KN": 1, "BI": 1, "RO": 2, "QU": 4, "KI": 0, "None": 0}
+FULL_PHASE = 24
+# Pawn structure penalties (middlegame, endgame)
+DOUBLED = (10, 20)
+ISOLATED = (10, 15)
+
+# Piece-square tables for White, printed from row 7 down to row 0 like a diagram
+_PAWN = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    10, 10, 20, 30, 30, 20, 10, 10,
+    5, 5, 10, 25, 25, 10, 5, 5,
+    0, 0, 0, 20, 20, 0, 0, 0,
+    5, -5, -10, 0, 0, -10, -5, 5,
+    5, 10, 10, -20, -20, 10, 10, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+_PAWN_END = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    80, 80, 80, 80, 80, 80, 80, 80,
+    50, 50, 50, 50, 50, 50, 50, 50,
+    30, 30, 30, 30, 30, 30, 30, 30,
+    15, 15, 15, 15, 15, 15, 15, 15,
+    5, 5, 5, 5, 5, 5, 5, 5,
+    0, 0, 0, 0, 0, 0, 0, 0,
+    0, 0, 0, 0, 0, 0, 0, 0,
+)
+_KNIGHT = (
+    -50, -40, -30, -30, -30, -30, -40, -50,
+    -40, -20, 0, 0, 0, 0, -20, -40,
+    -30, 0, 10, 15, 15, 10, 0, -30,
+    -30, 5, 15, 20, 20, 15, 5, -30,
+    -30, 0, 15, 20, 20, 15, 0, -30,
+    -30, 5, 10, 15, 15, 10, 5, -30,
+    -40, -20, 0, 5, 5, 0, -20, -40,
+    -50, -40, -30, -30, -30, -30, -40, -50,
+)
+_BISHOP = (
+    -20, -10, -10, -10, -10, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 10, 10, 5, 0, -10,
+    -10, 5, 5, 10, 10, 5, 5, -10,
+    -10, 0, 10, 10, 10, 10, 0, -10,
+    -10, 10, 10, 10, 10, 10, 10, -10,
+    -10, 5, 0, 0, 0, 0, 5, -10,
+    -20, -10, -10, -10, -10, -10, -10, -20,
+)
+_ROOK = (
+    0, 0, 0, 0, 0, 0, 0, 0,
+    5, 10, 10, 10, 10, 10, 10, 5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    -5, 0, 0, 0, 0, 0, 0, -5,
+    0, 0, 0, 5, 5, 0, 0, 0,
+)
+_QUEEN = (
+    -20, -10, -10, -5, -5, -10, -10, -20,
+    -10, 0, 0, 0, 0, 0, 0, -10,
+    -10, 0, 5, 5, 5, 5, 0, -10,
+    -5, 0, 5, 5, 5, 5, 0, -5,
+    0, 0, 5, 5, 5, 5, 0, -5,
+    -10, 5, 5, 5, 5, 5, 0, -10,
+    -10, 0, 5, 0, 0, 0, 0, -10,
+    -20, -10, -10, -5, -5, -10, -10, -20,
+)
+_KING = (
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -30, -40, -40, -50, -50, -40, -40, -30,
+    -20, -30, -30, -40, -40, -30, -30, -20,
+    -10, -20, -20, -20, -20, -20, -20, -10,
+    20, 20, 0, 0, 0, 0, 20, 20,
+    20, 30, 10, 0, 0, 10, 30, 20,
+)
+_KING_END = (
+    -50, -40, -30, -20, -20, -30, -40, -50,
+    -30, -20, -10, 0, 0, -10, -20, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 30, 40, 40, 30, -10, -30,
+    -30, -10, 20, 30, 30, 20, -10, -30,
+    -30, -30, 0, 0, 0, 0, -30, -30,
+    -50, -30, -30, -30, -30, -30, -30, -50,
+)
+_NONE = (0,) * 64
+_TABLES = {
+    "PA": (_PAWN, _PAWN_END), "KN": (_KNIGHT, _KNIGHT), "BI": (_BISHOP, _BISHOP),
+    "RO": (_ROOK, _ROOK), "QU": (_QUEEN, _QUEEN), "KI": (_KING, _KING_END), "None": (_NONE, _NONE),
+}
+
+
+def _signed(team: str, p_type: str, table: tuple, values: dict):
+    # White reads the diagram upside down, Black mirrors it; Black counts negative
+    if team == "W":
+        return [values[p_type] + table[(7 - x) * 8 + y] for x, y in POSITIONS]
+    return [-values[p_type] - table[x * 8 + y] for x, y in POSITIONS]
+
+
+# Value of a Piece on each Square, material included, signed for its Team
+MG = {(team, p_type): _signed(team, p_type, tables[0], MG_VALUES) for team in "WB" for p_type, tables in _TABLES.items()}
+EG = {(team, p_type): _signed(team, p_type, tables[1], EG_VALUES) for team in "WB" for p_type, tables in _TABLES.items()}
+# Pawn count step of each Team and column in the pawn files
+PAWN_FILES = {"W": [1 << 4 * y for y in range(8)], "B": [1 << 4 * (8 + y) for y in range(8)]}
+_STRUCTURES = {}
+_STRUCTURES_SIZE = 1 << 16
+
+
+def structure(pawns: int) -> Tuple[int, int]:
+    """
+    Function to score the doubled and isolated Pawns
+    of a set of pawn files, for White
+    """
+    cached = _STRUCTURES.get(pawns)
+    if cached is not None:
+        return cached
+    mg = eg = 0
+    for shift, sign in ((0, 1), (32, -1)):
+        counts = [pawns >> shift + 4 * y & 15 for y in range(8)]
+        for y, count in enumerate(counts):
+            if count > 1:
+                mg -= sign * DOUBLED[0] * (count - 1)
+                eg -= sign * DOUBLED[1] * (count - 1)
+            if count and not (y > 0 and counts[y - 1]) and not (y < 7 and counts[y + 1]):
+                mg -= sign * ISOLATED[0] * count
+                eg -= sign * ISOLATED[1] * count
+    if len(_STRUCTURES) >= _STRUCTURES_SIZE:
+        _STRUCTURES.clear()
+    _STRUCTURES[pawns] = (mg, eg)
+    return mg, eg
+
+
+def placed(terms: tuple, team: str, p_type: str, sq: int, sign: int = 1) -> tuple:
+    """
+    Function to add (sign 1) or take away (sign -1)
+    a Piece on a Square from the terms
+    """
+    mg, eg, phase, pawns = terms
+    mg += sign * MG[team, p_type][sq]
+    eg += sign * EG[team, p_type][sq]
+    phase += sign * PHASES[p_type]
+    if p_type == "PA":
+        pawns += sign * PAWN_FILES[team][sq & 7]
+    return mg, eg, phase, pawns
+
+
+def shifted(terms: tuple, team: str, p_type: str, i_sq: int, n_sq: int,
+            captured: Tuple[str, str] | None = None, promoted: str | None = None) -> tuple:
+    """
+    Function to update the terms for a Piece going from one Square to another,
+    capturing and converting on the way
+    """
+    mg, eg, phase, pawns = terms
+    table = MG[team, p_type]
+    mg += table[n_sq] - table[i_sq]
+    table = EG[team, p_type]
+    eg += table[n_sq] - table[i_sq]
+    if p_type == "PA" and (i_sq ^ n_sq) & 7:
+        files = PAWN_FILES[team]
+        pawns += files[n_sq & 7] - files[i_sq & 7]
+    terms = mg, eg, phase, pawns
+    if captured is not None:
+        terms = placed(terms, captured[0], captured[1], n_sq, -1)
+    if promoted is not None:
+        terms = placed(placed(terms, team, p_type, n_sq, -1), team, promoted, n_sq)
+    return terms
+
+
+def board_terms(board) -> tuple:
+    """
+    Function to count the terms of a ChessBoard from scratch
+    """
+    terms = (0, 0, 0, 0)
+    for x in range(8):
+        for y in range(8):
+            piece = board.board[x, y].piece
+            if piece is not None:
+                terms = placed(terms, piece.team, piece.p_type, x * 8 + y)
+    return terms
+
+
+def score(terms: tuple, turn: str) -> int:
+    """
+    Function to blend the middlegame and endgame scores by the phase,
+    in centipawns for the side to move
+    """
+    mg, eg, phase, pawns = terms
+    pawn_mg, pawn_eg = structure(pawns)
+    phase = min(phase, FULL_PHASE)
+    value = ((mg + pawn_mg) * phase + (eg + pawn_eg) * (FULL_PHASE - phase)) // FULL_PHASE
+    return value if turn == "W" else -value
@@ -0,0 +1,176 @@
+"""
+Append-only game store keeping the Position and move log of many games in one file,
+read back through a memory map with random access by game id
+
+File layout: MAGIC, then one record per save, each
+    RECORD header   record size, id length, DELETED flag, number of moves
+    id              utf-8 bytes
+    Position        Notation.SIZE bytes from Notation.encode
+    moves           one little-endian uint16 per move from Notation.pack_move
+
+A later record for the same id replaces the earlier one; compact() drops the stale ones.
+Opening only walks the record headers, and a record cut short by a crash is cut off.
+"""
+import mmap
+import os
+import struct
+
+import numpy as np
+
+from ChessBoard import ChessBoard
+from Notation import SIZE, encode, decode, pack_move, unpack_move
+
+
+MAGIC = b"CHSSTOR1"
+RECORD = struct.Struct("<IHHI")
+DELETED = 1
+
+
+class GameStore:
+    """
+    Class to save and load many games in one append-only file
+    """
+    def __init__(self, path: str):
+        self.path = path
+        is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, "a+b")
+        if is_new:
+            self.file.write(MAGIC)
+            self.file.flush()
+        self.index = {}
+        self.map = None
+        # Mapped length, and the end of the file including buffered appends
+        self.size = self.end = 0
+        self.remap()
+        if self.map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game store")
+        self.scan()
+
+    def remap(self):
+        """
+        Function to map the whole file again
+        once appends have outgrown the current map
+        """
+        self.file.flush()
+        if self.map is not None:
+            self.map.close()
+        self.size = self.end = os.path.getsize(self.path)
+        self.map = mmap.mmap(self.file.fileno(), self.size, access=mmap.ACCESS_READ)
+
+    def scan(self):
+        """
+        Function to index the latest record of every game,
+        cutting off a trailing record left incomplete by a crash
+        """
+        offset = len(MAGIC)
+        while offset + RECORD.size <= self.size:
+            length, id_length, flags, count = RECORD.unpack_from(self.map, offset)
+            if length != RECORD.size + id_length + SIZE + 2 * count or offset + length > self.size:
+                break
+            game_id = bytes(self.map[offset + RECORD.size:offset + RECORD.size + id_length]).decode()
+            if flags & DELETED:
+                self.index.pop(game_id, None)
+            else:
+                self.index[game_id] = offset
+            offset += length
+        if offset < self.size:
+            self.map.close()
+            self.map = None
+            self.file.truncate(offset)
+            self.remap()
+
+    def append(self, game_id: str, position: bytes, moves, flags: int = 0):
+        name = game_id.encode()
+        moves = np.asarray(moves, dtype="<u2")
+        offset, length = self.end, RECORD.size + len(name) + SIZE + 2 * len(moves)
+        self.file.write(RECORD.pack(length, len(name), flags, len(moves)) + name + position + moves.tobytes())
+        self.end += length
+        return offset
+
+    def save(self, game_id: str, board: ChessBoard, moves=()):
+        """
+        Function to append a game's Position and move log,
+        with moves as legal_moves rows or packed ints
+        """
+        moves = [pack_move(*move) if isinstance(move, (tuple, list, np.ndarray)) else move for move in moves]
+        self.index[game_id] = self.append(game_id, encode(board), moves)
+
+    def delete(self, game_id: str):
+        if self.index.pop(game_id, None) is not None:
+            self.append(game_id, bytes(SIZE), (), DELETED)
+
+    def record(self, game_id: str):
+        """
+        Function to find a game's record in the map,
+        as offsets of its Position and moves and the number of moves
+        """
+        offset = self.index.get(game_id)
+        if offset is None:
+            raise KeyError(game_id)
+        if offset >= self.size:
+            self.remap()
+        length, id_length, flags, count = RECORD.unpack_from(self.map, offset)
+        start = offset + RECORD.size + id_length
+        return start, start + SIZE, count
+
+    def position(self, game_id: str) -> bytes:
+        start, _, _ = self.record(game_id)
+        return self.map[start:start + SIZE]
+
+    def packed(self, game_id: str) -> np.ndarray:
+        """
+        Function to read a game's move log as packed ints,
+        copied out of the map so the map can be replaced while the array lives on
+        """
+        _, start, count = self.record(game_id)
+        return np.frombuffer(self.map, dtype="<u2", count=count, offset=start).copy()
+
+    def moves(self, game_id: str) -> np.ndarray:
+        """
+        Function to read a game's move log
+        as rows of From Square, To Square and Pawn Conversion code
+        """
+        return np.stack(unpack_move(self.packed(game_id)), axis=1).astype(np.uint8).reshape(-1, 3)
+
+    def load(self, game_id: str, bitboard: bool = False) -> ChessBoard:
+        return decode(self.position(game_id), bitboard)
+
+    def compact(self):
+        """
+        Function to rewrite the file
+        with only the latest record of every game
+        """
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as out:
+            out.write(MAGIC)
+            index, offset = {}, len(MAGIC)
+            for game_id, start in self.index.items():
+                if start >= self.size:
+                    self.remap()
+                length = RECORD.unpack_from(self.map, start)[0]
+                out.write(self.map[start:start + length])
+                index[game_id] = offset
+                offset += length
+        self.map.close()
+        self.map = None
+        self.file.close()
+        os.replace(temp, self.path)
+        self.file = open(self.path, "a+b")
+        self.index = index
+        self.remap()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __contains__(self, game_id: str):
+        return game_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
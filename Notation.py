@@ -0,0 +1,238 @@
+"""
+FEN import/export and a fixed-size 32 byte binary encoding of ChessBoard Positions
+
+Binary layout (little-endian):
+    8 bytes   occupancy, bit x*8+y set for every Piece
+    16 bytes  one 4-bit PIECE_CODES index per Piece in square order, low nibble first
+    1 byte    flags: Black to move, White on Check, Black on Check
+    1 byte    reserved, zero
+    2 bytes   Pieces still at their Initial Position on the end rows, bit y for row 0, 8 + y for row 7
+    4 bytes   reserved, zero
+
+The engine has no en passant or move clocks, so FEN import ignores those fields
+and export writes "-" and the given clocks. FEN only keeps Castling rights,
+so a Rook that never moved beside a King that did loses that flag on a round trip.
+"""
+import struct
+from typing import Tuple
+
+from BitBoard import BitBoard, bit_squares
+from ChessBoard import ChessBoard, Piece, Block, PositionTable, DEAD, KINGS
+from Evaluation import board_terms
+from Zobrist import board_key
+
+
+LETTERS = {"PA": "p", "KN": "n", "BI": "b", "RO": "r", "QU": "q", "KI": "k"}
+TYPES = {letter: p_type for p_type, letter in LETTERS.items()}
+# Pieces left by a Pawn Conversion without a Type (move()'s default p_conv) are kept as "None"
+PIECE_CODES = [(team, p_type) for team in ("W", "B") for p_type in LETTERS] + [("W", "None"), ("B", "None")]
+CODES = {piece: code for code, piece in enumerate(PIECE_CODES)}
+# Castling rights as FEN letter, Row and Rook column
+CASTLING = (("K", 0, 7), ("Q", 0, 0), ("k", 7, 7), ("q", 7, 0))
+BLACK_TO_MOVE, W_CHECK, B_CHECK = 1, 2, 4
+LAYOUT = struct.Struct("<Q16sBxH4x")
+SIZE = LAYOUT.size
+START = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+# Ids and names of a fresh ChessBoard in team_wise_id order, with the Position each one starts on
+_OFFICERS = ("RO", "KN", "BI", "QU", "KI", "BI", "KN", "RO")
+_IDS = {
+    "W": [(y, f"W {p_type} {y}", p_type, (0, y)) for y, p_type in enumerate(_OFFICERS)]
+    + [(8 + y, f"W PA {y}", "PA", (1, y)) for y in range(8)],
+    "B": [(16 + y, f"B PA {y}", "PA", (6, y)) for y in range(8)]
+    + [(24 + y, f"B {p_type} {y}", p_type, (7, y)) for y, p_type in enumerate(_OFFICERS)],
+}
+_HOMES = {entry[3]: entry for team in _IDS for entry in _IDS[team]}
+
+
+def pack_move(i_sq: int, n_sq: int, code: int = 0) -> int:
+    """
+    Function to pack a legal_moves row
+    into one 16-bit int
+    """
+    return i_sq | n_sq << 6 | code << 12
+
+
+def unpack_move(move: int) -> Tuple[int, int, int]:
+    return move & 63, move >> 6 & 63, move >> 12
+
+
+def castling_rights(board: ChessBoard) -> str:
+    """
+    Function to list the Castling rights as FEN letters,
+    from Kings and Rooks still at their Initial Position
+    """
+    rights = ""
+    for letter, x, y in CASTLING:
+        king, rook = board.board[x, 4].piece, board.board[x, y].piece
+        team = "W" if x == 0 else "B"
+        if (king is not None and rook is not None and king.team == team == rook.team
+                and king.p_type == "KI" and rook.p_type == "RO" and king.is_start() and rook.is_start()):
+            rights += letter
+    return rights
+
+
+def build(pieces: list, turn: str, unmoved: set, checks: Tuple[bool, bool] | None = None, bitboard: bool = False) -> ChessBoard:
+    """
+    Function to make a ChessBoard from (Position, Team, Piece Type) triples
+    and the Positions of Pieces still at their Initial Position (Pawns go by their row),
+    giving every Piece the id it would have in a game from the Initial Position
+    """
+    board = ChessBoard()
+    for x in range(8):
+        for y in range(8):
+            board.board[x, y] = Block(" ")
+    board.all_pos, board.team_wise_id = PositionTable(), [[], []]
+    board.turn = turn
+    for index, team in enumerate(("W", "B")):
+        for r_id, label, p_type, home in _IDS[team]:
+            board.team_wise_id[index].append(board.all_pos.add(label, DEAD))
+    for index, team in enumerate(("W", "B")):
+        own = sorted((pos, p_type) for pos, t, p_type in pieces if t == team)
+        ids = {}
+        free = list(_IDS[team])
+        # Pieces on their Initial Position first (so Castling Rooks keep the id of their column),
+        # then on the column of a free id, then any free id of their Type
+        for pos, p_type in own:
+            entry = _HOMES.get(pos)
+            if entry is not None and entry[1][0] == team and entry[2] == p_type:
+                free.remove(entry)
+                ids[pos] = entry[0]
+        for same in (lambda home, pos: home[1] == pos[1], lambda home, pos: True):
+            for pos, p_type in own:
+                if pos in ids:
+                    continue
+                home = [entry for entry in free if entry[2] == p_type and same(entry[3], pos)]
+                if home:
+                    free.remove(home[0])
+                    ids[pos] = home[0][0]
+        for pos, p_type in own:
+            if pos not in ids:
+                # More Pieces of a Type than at the start, so from a Pawn Conversion, named like one
+                ids[pos] = board.all_pos.add(f"{team} {p_type} {len(board.all_pos)}", DEAD)
+                board.team_wise_id[index].append(ids[pos])
+            piece = Piece(team, p_type, pos, ids[pos])
+            if p_type == "PA":
+                is_start = pos[0] == (1 if team == "W" else 6)
+            else:
+                is_start = pos in unmoved
+            if not is_start:
+                piece.new_pos(pos)
+            board.board[pos].piece = piece
+            board.board[pos].name = team + p_type
+            board.all_pos.squares[piece.id] = pos[0] * 8 + pos[1]
+    if bitboard:
+        board.bits = BitBoard.from_board(board.board)
+    if checks is None:
+        # Only the side to move can be on Check
+        on_check = False
+        if board.all_pos[KINGS[turn]] is not None:
+            board.is_w_on_check, board.is_b_on_check = turn == "W", turn == "B"
+            on_check = board.is_under_attack()
+        checks = (on_check and turn == "W", on_check and turn == "B")
+    board.is_w_on_check, board.is_b_on_check = checks
+    board.key = board_key(board)
+    board.terms = board_terms(board)
+    board.origin = encode(board)
+    return board
+
+
+def to_fen(board: ChessBoard, halfmove: int = 0, fullmove: int = 1) -> str:
+    """
+    Function to write a ChessBoard as FEN
+    """
+    rows = []
+    for x in range(7, -1, -1):
+        row, empty = "", 0
+        for y in range(8):
+            piece = board.board[x, y].piece
+            if piece is None:
+                empty += 1
+                continue
+            if piece.p_type not in LETTERS:
+                raise ValueError(f"No FEN letter for Piece Type {piece.p_type!r}")
+            letter = LETTERS[piece.p_type]
+            row += (str(empty) if empty else "") + (letter.upper() if piece.team == "W" else letter)
+            empty = 0
+        rows.append(row + (str(empty) if empty else ""))
+    rights = castling_rights(board) or "-"
+    return f"{'/'.join(rows)} {board.turn.lower()} {rights} - {halfmove} {fullmove}"
+
+
+def from_fen(fen: str, bitboard: bool = False) -> ChessBoard:
+    """
+    Function to read a ChessBoard from FEN
+    """
+    fields = fen.split()
+    if len(fields) < 2:
+        raise ValueError(f"FEN needs at least placement and side to move: {fen!r}")
+    rows = fields[0].split("/")
+    if len(rows) != 8:
+        raise ValueError(f"FEN placement needs 8 rows: {fields[0]!r}")
+    pieces = []
+    for i, row in enumerate(rows):
+        x, y = 7 - i, 0
+        for char in row:
+            if char.isdigit():
+                y += int(char)
+            elif char.lower() in TYPES:
+                if y > 7:
+                    raise ValueError(f"FEN row {row!r} covers more than 8 columns")
+                pieces.append(((x, y), "W" if char.isupper() else "B", TYPES[char.lower()]))
+                y += 1
+            else:
+                raise ValueError(f"Bad FEN piece {char!r}")
+        if y != 8:
+            raise ValueError(f"FEN row {row!r} does not cover 8 columns")
+    if fields[1] not in ("w", "b"):
+        raise ValueError(f"Bad FEN side to move {fields[1]!r}")
+    rights = fields[2] if len(fields) > 2 else "-"
+    unmoved = set()
+    for letter, x, y in CASTLING:
+        if letter in rights:
+            unmoved.update({(x, 4), (x, y)})
+    # Other Pieces standing on their Initial Position are taken as never moved
+    for pos, team, p_type in pieces:
+        if p_type not in ("PA", "KI", "RO") and any(home == pos and t == p_type for _, _, t, home in _IDS[team]):
+            unmoved.add(pos)
+    return build(pieces, fields[1].upper(), unmoved, bitboard=bitboard)
+
+
+def encode(board: ChessBoard) -> bytes:
+    """
+    Function to pack a ChessBoard
+    into SIZE bytes
+    """
+    occupancy, codes, unmoved = 0, [], 0
+    for x in range(8):
+        for y in range(8):
+            piece = board.board[x, y].piece
+            if piece is not None:
+                occupancy |= 1 << (x * 8 + y)
+                codes.append(CODES[piece.team, piece.p_type])
+                if x in (0, 7) and piece.is_start():
+                    unmoved |= 1 << (y if x == 0 else 8 + y)
+    if len(codes) > 32:
+        raise ValueError(f"{len(codes)} Pieces do not fit the encoding")
+    codes += [0] * (len(codes) & 1)
+    nibbles = bytes(codes[i] | codes[i + 1] << 4 for i in range(0, len(codes), 2))
+    flags = BLACK_TO_MOVE if board.turn == "B" else 0
+    flags |= (W_CHECK if board.is_w_on_check else 0) | (B_CHECK if board.is_b_on_check else 0)
+    return LAYOUT.pack(occupancy, nibbles, flags, unmoved)
+
+
+def decode(data: bytes, bitboard: bool = False) -> ChessBoard:
+    """
+    Function to unpack a ChessBoard
+    from the first SIZE bytes of a buffer
+    """
+    occupancy, nibbles, flags, unmoved = LAYOUT.unpack_from(data)
+    pieces = []
+    for i, sq in enumerate(bit_squares(occupancy)):
+        code = nibbles[i >> 1] >> (4 * (i & 1)) & 15
+        if code >= len(PIECE_CODES):
+            raise ValueError(f"Bad piece code {code}")
+        team, p_type = PIECE_CODES[code]
+        pieces.append(((sq >> 3, sq & 7), team, p_type))
+    unmoved = {(0 if bit < 8 else 7, bit & 7) for bit in range(16) if unmoved >> bit & 1}
+    return build(pieces, "B" if flags & BLACK_TO_MOVE else "W", unmoved,
+                 (bool(flags & W_CHECK), bool(flags & B_CHECK)), bitboard)
@@ -0,0 +1,160 @@
+"""
+Parallel search splitting the root moves of a Position over a process pool
+
+Workers get the Position as its 32 byte Notation encoding and one root move,
+and search it with a fresh Transposition Table. Every iteration searches the best move
+of the last one first, with a full window, then the others in parallel with its score as alpha,
+so they are cut as soon as they cannot beat it. That alpha is fixed for the whole iteration,
+so the result does not depend on the number of workers or the order they finish in
+(as long as the search is bounded by depth, not time).
+
+Usage: python ParallelSearch.py [--fen FEN] [--depth N] [--workers N ...]
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+from BitBoard import POSITIONS, PROMOTIONS
+from ChessBoard import ChessBoard
+from Engine import Engine, SearchAborted, MATE, MATE_BOUND
+from Notation import encode, decode
+
+
+# One Engine per worker process, its Table cleared for every task
+_engine = None
+
+
+def search_move(position: bytes, move: Tuple[int, int, int], depth: int, deadline: float | None = None,
+                alpha: int = -MATE - 1):
+    """
+    Function to score one root move to a depth on a decoded Position,
+    as the score for the side to move at the root, the principal variation and the nodes searched
+    A score not above alpha only tells the move is no better than alpha
+    None once the deadline passes
+    """
+    global _engine
+    if _engine is None:
+        _engine = Engine(1 << 16)
+    engine = _engine
+    engine.table.clear()
+    engine.killers, engine.nodes, engine.limit, engine.deadline = [], 0, None, deadline
+    engine.can_abort = deadline is not None
+    board = decode(position, True)
+    if not engine.make(board, move):
+        return None
+    line = []
+    try:
+        if depth > 0:
+            score = -engine.alpha_beta(board, depth, -MATE - 1, -alpha, 1, line)
+        else:
+            score = -engine.quiesce(board, -MATE - 1, -alpha, 1)
+    except SearchAborted:
+        return None
+    finally:
+        engine.can_abort = False
+    return score, [move] + line, engine.nodes
+
+
+class ParallelSearch:
+    """
+    Class to search a Position by root move splitting over a process pool,
+    or in this process when there is one worker
+    """
+    def __init__(self, workers: int | None = None):
+        self.workers = workers or os.cpu_count() or 1
+        self.pool = ProcessPoolExecutor(self.workers) if self.workers > 1 else None
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.shutdown()
+
+    def run(self, tasks: list):
+        if self.pool is None:
+            return [search_move(*task) for task in tasks]
+        return list(self.pool.map(search_move, *zip(*tasks)))
+
+    def search(self, board: ChessBoard, depth: int = 4, movetime: float | None = None):
+        """
+        Function to find the best move by iterative deepening,
+        every iteration scoring the best move of the last one, then the other root moves in parallel against it
+        Returns the same fields as Engine.search and the number of workers
+        """
+        start = time.perf_counter()
+        deadline = start + movetime if movetime is not None else None
+        position = encode(board)
+        engine = Engine(1)
+        moves = []
+        for move in engine.order(board, board.strict_moves().tolist(), None, 0):
+            if engine.make(board, move):
+                board.prev_cp()
+                moves.append(tuple(move))
+        result = {"move": None, "pv": [], "score": 0, "depth": 0}
+        nodes = 0
+        for d in range(1, depth + 1):
+            if not moves:
+                break
+            # The first iteration always completes, so there is a move whenever one is legal
+            limit = deadline if d > 1 else None
+            scored = self.run([(position, moves[0], d - 1, limit)])
+            if scored[0] is not None:
+                scored += self.run([(position, move, d - 1, limit, scored[0][0]) for move in moves[1:]])
+            nodes += sum(entry[2] for entry in scored if entry is not None)
+            if any(entry is None for entry in scored):
+                break
+            # Only moves above the first one's score have an exact score;
+            # stable sort keeps the earlier order between equal scores
+            order = sorted(range(len(moves)), key=lambda i: -scored[i][0])
+            moves = [moves[i] for i in order]
+            score, pv, _ = scored[order[0]]
+            result.update(pv=pv, score=score, depth=d)
+            if abs(score) > MATE_BOUND:
+                break
+        elapsed = time.perf_counter() - start
+        result["pv"] = [(POSITIONS[i_sq], POSITIONS[n_sq], PROMOTIONS[code - 1] if code else None)
+                        for i_sq, n_sq, code in result["pv"]]
+        result["move"] = result["pv"][0] if result["pv"] else None
+        result.update(nodes=nodes, time=elapsed, nps=nodes / elapsed if elapsed else 0.0, workers=self.workers)
+        return result
+
+
+def speedup(board: ChessBoard, depth: int, counts: list):
+    """
+    Function to time the same search with each number of workers,
+    printing the speedup over the serial Engine search and whether the results agree
+    """
+    first = Engine().search(board, depth)
+    base = first["time"]
+    print(f"engine       depth {first['depth']}  score {first['score']:>6}  nodes {first['nodes']:>8}  "
+          f"time {base:7.2f}s")
+    for workers in counts:
+        search = ParallelSearch(workers)
+        try:
+            result = search.search(board, depth)
+        finally:
+            search.close()
+        # Lines of equal score past the root move depend on the Tables, so only the move and score are compared
+        same = (result["move"], result["score"]) == (first["move"], first["score"])
+        print(f"workers {workers:>3}  depth {result['depth']}  score {result['score']:>6}  nodes {result['nodes']:>8}  "
+              f"time {result['time']:7.2f}s  speedup {base / result['time']:5.2f}x  "
+              f"efficiency {base / result['time'] / workers:5.2f}  {'same' if same else 'DIFFERENT'}")
+
+
+if __name__ == "__main__":
+    from Notation import START, from_fen
+
+    parser = argparse.ArgumentParser(description="Parallel search speedup against the number of workers")
+    parser.add_argument("--fen", default=START)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="*",
+                        help="worker counts to compare (default 1, 2, 4, ... up to the CPU count)")
+    args = parser.parse_args()
+    counts = args.workers
+    if not counts:
+        counts, n = [], 1
+        while n < (os.cpu_count() or 1):
+            counts.append(n)
+            n *= 2
+        counts.append(os.cpu_count() or 1)
+    speedup(from_fen(args.fen, True), args.depth, counts)
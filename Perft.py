@@ -0,0 +1,152 @@
+"""
+Perft harness to count the leaf nodes of the move tree
+and benchmark move generation against known reference values
+
+The moves come from ChessBoard.strict_moves, which follows the rules of Chess
+(but for en passant, which the engine does not play). With --legacy they come from
+legal_moves instead and are checked against the counts of the engine's own rules.
+
+Usage: python Perft.py [--depth N] [--bitboard] [--legacy] [--repeat N] [--only NAME]
+"""
+import argparse
+import time
+from typing import Tuple
+
+from BitBoard import POSITIONS as SQUARES, PROMOTIONS
+from ChessBoard import ChessBoard
+
+# Test positions as the moves leading to them from the initial ChessBoard(),
+# with reference node counts per depth from standard chess rules
+POSITIONS = [
+    ("initial", "", {1: 20, 2: 400, 3: 8902, 4: 197281}),
+    ("double step", "e2e3 d7d5 d2d4 c7c6", {1: 33, 2: 919, 3: 29838}),
+    ("check", "e2e4 f7f6 d1h5", {1: 1, 2: 43, 3: 798}),
+    ("promotion", "h2h4 g7g5 h4g5 h7h6 g5h6 f8g7 h6g7 b8c6", {1: 29, 2: 665, 3: 19829}),
+    ("castling", "e2e4 e7e5 g1f3 b8c6 f1c4 g8f6 d2d4 d7d5 c1g5 c8g4 d1d2 d8d7 b1c3 f8b4", {1: 45, 2: 2075, 3: 87769}),
+]
+
+# Node counts of legal_moves per test position, under the engine's own rules
+# which part from standard chess in places
+LEGACY = {
+    "initial": {1: 20, 2: 400, 3: 8902, 4: 197469},
+    "double step": {1: 33, 2: 922, 3: 29983},
+    "check": {1: 1, 2: 43, 3: 829},
+    "promotion": {1: 29, 2: 671, 3: 20017},
+    "castling": {1: 43, 2: 1898, 3: 80653},
+}
+
+
+def parse(text: str) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+    """
+    Function to convert a move like "e2e4"
+    into Current and New Positions
+    """
+    return (int(text[1]) - 1, ord(text[0]) - ord("a")), (int(text[3]) - 1, ord(text[2]) - ord("a"))
+
+
+def setup(moves: str, bitboard: bool = False) -> ChessBoard:
+    """
+    Function to play a test position
+    with its moves from the initial Position
+    """
+    board = ChessBoard(bitboard)
+    for text in moves.split():
+        board.move(*parse(text), p_conv=text[4:] or None)
+    return board
+
+
+def moves(board: ChessBoard, strict: bool = False):
+    """
+    Function to list every move of the side to move
+    as Current Position, New Position and Pawn Conversion
+    """
+    rows = board.strict_moves() if strict else board.legal_moves()
+    return [(SQUARES[i_sq], SQUARES[n_sq], PROMOTIONS[code - 1] if code else None)
+            for i_sq, n_sq, code in rows.tolist()]
+
+
+def perft(board: ChessBoard, depth: int, strict: bool = False) -> int:
+    """
+    Function to count the Positions reached after depth moves
+    """
+    if depth == 0:
+        return 1
+    # Off check, move() never takes a move back, so the last ply can just be counted
+    if depth == 1 and strict:
+        return len(board.strict_moves())
+    if depth == 1 and not (board.is_b_on_check or board.is_w_on_check):
+        return len(board.legal_moves())
+    candidates = moves(board, strict)
+    nodes, team = 0, board.turn
+    for i_pos, n_pos, p_conv in candidates:
+        board.snap_shot()
+        board.move(i_pos, n_pos, p_conv=p_conv)
+        # move() restores the board itself when the move leaves the King attacked
+        if board.turn != team:
+            nodes += perft(board, depth - 1, strict)
+        board.prev_cp()
+    return nodes
+
+
+def divide(board: ChessBoard, depth: int, strict: bool = False):
+    """
+    Function to split the perft count
+    by the first move, for tracking down a wrong count
+    """
+    result, team = {}, board.turn
+    for i_pos, n_pos, p_conv in moves(board, strict):
+        board.snap_shot()
+        board.move(i_pos, n_pos, p_conv=p_conv)
+        if board.turn != team:
+            result[(i_pos, n_pos, p_conv)] = perft(board, depth - 1, strict)
+        board.prev_cp()
+    return result
+
+
+def run(depth: int = 3, bitboard: bool = False, repeat: int = 1, only: str | None = None, strict: bool = True):
+    """
+    Function to run every test position up to a depth,
+    printing node counts, nodes per second and mismatches
+    """
+    failures = 0
+    total_nodes, total_time = 0, 0.0
+    for name, line, expected in POSITIONS:
+        if only is not None and name != only:
+            continue
+        if not strict:
+            expected = LEGACY[name]
+        for d in range(1, depth + 1):
+            if d not in expected:
+                continue
+            best = None
+            try:
+                for _ in range(repeat):
+                    board = setup(line, bitboard)
+                    start = time.perf_counter()
+                    nodes = perft(board, d, strict)
+                    elapsed = time.perf_counter() - start
+                    best = elapsed if best is None else min(best, elapsed)
+            except Exception as e:
+                failures += 1
+                print(f"{name:<12} depth {d}  ERROR {type(e).__name__}: {e}")
+                continue
+            total_nodes += nodes
+            total_time += best
+            status = "ok" if nodes == expected[d] else "FAIL"
+            failures += status != "ok"
+            print(f"{name:<12} depth {d}  nodes {nodes:>9}  expected {expected[d]:>9}  "
+                  f"{nodes / best if best else 0:>10.0f} nps  {status}")
+    print(f"total {total_nodes} nodes in {total_time:.3f}s, "
+          f"{total_nodes / total_time if total_time else 0:.0f} nps, {failures} failed")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perft correctness and speed check")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--bitboard", action="store_true")
+    parser.add_argument("--legacy", action="store_true", help="count legal_moves instead of strict_moves")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--only")
+    args = parser.parse_args()
+    raise SystemExit(1 if run(args.depth, args.bitboard, args.repeat, args.only, not args.legacy) else 0)
@@ -0,0 +1,215 @@
+"""
+Streaming PGN import: reads games one at a time from any size of file,
+resolves every SAN move against the strict legal moves of the Board and plays it with move(),
+fanning games out over a process pool and reporting the ones that fail
+
+Usage: python Pgn.py GAMES.pgn [--workers N] [--batch N] [--grid] [--errors FILE]
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+from BitBoard import POSITIONS, PROMOTIONS
+from ChessBoard import ChessBoard
+from Engine import piece_at
+from Notation import from_fen
+
+
+PIECES = {"K": "KI", "Q": "QU", "R": "RO", "B": "BI", "N": "KN"}
+SAN = re.compile(r"([KQRBN])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([QRBN]))?[+#]?[!?]*")
+CASTLE = re.compile(r"([O0]-[O0](?:-[O0])?)[+#]?[!?]*")
+# Comments, variations, NAGs, move numbers and results around the moves
+TOKENS = re.compile(r"\{[^}]*\}?|;[^\n]*|\(|\)|\$\d+|1-0|0-1|1/2-1/2|\*|\d+\.+|[^\s(){};$]+")
+HEADER = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\s*\]')
+
+
+class PgnError(Exception):
+    """
+    Error for a game that cannot be read or replayed
+    """
+
+
+def read_games(lines):
+    """
+    Function to split a stream of PGN lines into game texts,
+    holding only one game in memory at a time
+    """
+    game, in_moves = [], False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith("[") and in_moves:
+            yield "".join(game)
+            game, in_moves = [], False
+        elif stripped and not stripped.startswith("[") and not stripped.startswith("%"):
+            in_moves = True
+        game.append(line)
+    if any(line.strip() for line in game):
+        yield "".join(game)
+
+
+def parse(text: str):
+    """
+    Function to read the headers and the SAN moves
+    of a game's text, leaving out comments and variations
+    """
+    headers, moves, depth = {}, [], 0
+    body = []
+    for line in text.splitlines():
+        match = HEADER.fullmatch(line.strip())
+        if match is not None and not moves and not body:
+            headers[match[1]] = match[2].replace('\\"', '"')
+        else:
+            body.append(line)
+    for token in TOKENS.findall("\n".join(body)):
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth = max(0, depth - 1)
+        elif depth or token[0] in "{;$*" or token[0].isdigit():
+            # A move number, result, comment or NAG (results all start with a digit)
+            continue
+        else:
+            moves.append(token)
+    return headers, moves
+
+
+def resolve(board: ChessBoard, san: str) -> Tuple[Tuple[int, int], Tuple[int, int], str | None]:
+    """
+    Function to find the move a SAN token means for the side to move,
+    as Current Position, New Position and Pawn Conversion
+    """
+    team = board.turn
+    moves = board.strict_moves().tolist()
+    castle = CASTLE.fullmatch(san)
+    if castle is not None:
+        # move() castles when the King is moved onto its own Rook
+        x = 0 if team == "W" else 7
+        rook = x * 8 + (0 if len(castle[1]) == 5 else 7)
+        if [x * 8 + 4, rook, 0] not in moves:
+            raise PgnError(f"{san} is not a legal move")
+        return (x, 4), POSITIONS[rook], None
+    match = SAN.fullmatch(san)
+    if match is None:
+        raise PgnError(f"bad SAN {san!r}")
+    letter, file, rank, target, promotion = match.groups()
+    p_type = PIECES[letter] if letter else "PA"
+    n_sq = (int(target[1]) - 1) * 8 + ord(target[0]) - ord("a")
+    code = PROMOTIONS.index(PIECES[promotion]) + 1 if promotion else 0
+    candidates = []
+    for i_sq, to_sq, c in moves:
+        if to_sq != n_sq or c != code or piece_at(board, i_sq) != (team, p_type):
+            continue
+        if (file and ord(file) - ord("a") != i_sq & 7) or (rank and int(rank) - 1 != i_sq >> 3):
+            continue
+        candidates.append(i_sq)
+    if not candidates:
+        if p_type == "PA" and file and piece_at(board, n_sq) is None:
+            raise PgnError(f"{san} is en passant, which the engine does not play")
+        raise PgnError(f"{san} is not a legal move")
+    if len(candidates) > 1:
+        raise PgnError(f"{san} is ambiguous")
+    return POSITIONS[candidates[0]], POSITIONS[n_sq], PROMOTIONS[code - 1] if code else None
+
+
+def replay(text: str, bitboard: bool = True):
+    """
+    Function to replay one game from its PGN text,
+    returning its headers, the number of moves played and the error that stopped it (None if none did)
+    """
+    try:
+        headers, moves = parse(text)
+    except Exception as e:
+        return {"headers": {}, "plies": 0, "error": f"unreadable game: {e}"}
+    try:
+        board = from_fen(headers["FEN"], bitboard) if "FEN" in headers else ChessBoard(bitboard)
+    except ValueError as e:
+        return {"headers": headers, "plies": 0, "error": str(e)}
+    for ply, san in enumerate(moves):
+        try:
+            i_pos, n_pos, p_conv = resolve(board, san)
+            team = board.turn
+            board.move(i_pos, n_pos, p_conv=p_conv)
+            if board.turn == team:
+                raise PgnError(f"{san} was refused by move()")
+        except PgnError as e:
+            return {"headers": headers, "plies": ply, "error": f"move {ply // 2 + 1}: {e}"}
+        except Exception as e:
+            return {"headers": headers, "plies": ply, "error": f"move {ply // 2 + 1} {san}: {type(e).__name__}: {e}"}
+    return {"headers": headers, "plies": len(moves), "error": None}
+
+
+def replay_batch(texts: list, bitboard: bool = True):
+    return [replay(text, bitboard) for text in texts]
+
+
+def replay_stream(lines, workers: int = 1, batch: int = 64, bitboard: bool = True):
+    """
+    Function to replay every game of a PGN stream in order,
+    yielding each game's result; with workers > 1 batches of games go to a process pool,
+    with only a few batches in flight so memory stays flat however large the stream
+    """
+    games = read_games(lines)
+    if workers <= 1:
+        for text in games:
+            yield replay(text, bitboard)
+        return
+    with ProcessPoolExecutor(workers) as pool:
+        pending = deque()
+        chunk = []
+        for text in games:
+            chunk.append(text)
+            if len(chunk) == batch:
+                pending.append(pool.submit(replay_batch, chunk, bitboard))
+                chunk = []
+                if len(pending) >= 2 * workers:
+                    yield from pending.popleft().result()
+        if chunk:
+            pending.append(pool.submit(replay_batch, chunk, bitboard))
+        while pending:
+            yield from pending.popleft().result()
+
+
+def run(path: str, workers: int = 1, batch: int = 64, bitboard: bool = True, errors=sys.stderr):
+    """
+    Function to replay a PGN file, writing one line per failed game
+    and printing games per second
+    """
+    start = time.perf_counter()
+    games = failed = plies = 0
+    with open(path, encoding="utf-8", errors="replace") as lines:
+        for result in replay_stream(lines, workers, batch, bitboard):
+            games += 1
+            plies += result["plies"]
+            if result["error"] is not None:
+                failed += 1
+                headers = result["headers"]
+                print(f"game {games} ({headers.get('White', '?')} - {headers.get('Black', '?')}, "
+                      f"{headers.get('Date', '?')}): {result['error']}", file=errors)
+            if games % 10000 == 0:
+                elapsed = time.perf_counter() - start
+                print(f"{games} games, {games / elapsed:.0f} games/s", file=sys.stderr)
+    elapsed = time.perf_counter() - start
+    print(f"{games} games ({failed} failed), {plies} moves in {elapsed:.2f}s: "
+          f"{games / elapsed if elapsed else 0:.1f} games/s, {plies / elapsed if elapsed else 0:.0f} moves/s")
+    return games, failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay the games of a PGN file")
+    parser.add_argument("path")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--batch", type=int, default=64, help="games sent to a worker at once")
+    parser.add_argument("--grid", action="store_true", help="use the Block grid instead of the BitBoard")
+    parser.add_argument("--errors", help="file for the failed games (default stderr)")
+    args = parser.parse_args()
+    out = open(args.errors, "w") if args.errors else sys.stderr
+    try:
+        run(args.path, args.workers, args.batch, not args.grid, out)
+    finally:
+        if out is not sys.stderr:
+            out.close()
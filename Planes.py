@@ -0,0 +1,224 @@
+"""
+Batched encoding of ChessBoards and FEN strings into piece planes for analytics and ML,
+an array of shape (N, 12 + extra planes, 8, 8), and the decoder back to FEN
+
+planes[n, p, x, y] is 1 when the p-th of PIECE_PLANES stands on Row x, Column y
+(ChessBoard coordinates, Row 0 is White's end). Optional planes follow in the order asked for:
+    "turn"       1 plane, all 1 when White is to move
+    "castling"   4 planes, all 1 for each FEN Castling right K, Q, k, q
+    "attacked"   2 planes, Squares attacked by White and by Black (Kings included)
+
+FEN placements are expanded and one-hot encoded by numpy for the whole batch,
+and Boards go through their 64 bit masks, so no Python runs per Square.
+Attacked planes of FEN strings come from a bare BitBoard of the decoded placement, one step per Piece.
+Conversions without a Type ("None" Pieces) have no plane and are left out.
+
+Usage: python Planes.py [--count N] [--extras turn castling attacked]
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+
+from BitBoard import BitBoard, KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, POSITIONS
+from ChessBoard import ChessBoard, DEAD
+from Notation import LETTERS, CASTLING, castling_rights
+
+
+PIECE_PLANES = [(team, p_type) for team in ("W", "B") for p_type in ("PA", "KN", "BI", "RO", "QU", "KI")]
+EXTRA_PLANES = {"turn": 1, "castling": 4, "attacked": 2}
+EMPTY = len(PIECE_PLANES)
+# FEN letter of each plane, and the plane of each FEN byte (EMPTY for anything else)
+PLANE_LETTERS = np.array([ord(LETTERS[p_type].upper() if team == "W" else LETTERS[p_type])
+                          for team, p_type in PIECE_PLANES] + [ord(".")], dtype=np.uint8)
+FEN_PLANES = np.full(256, EMPTY, dtype=np.uint8)
+FEN_PLANES[PLANE_LETTERS[:EMPTY]] = np.arange(EMPTY, dtype=np.uint8)
+# Digits become runs of empty Squares, so a placement expands to 64 bytes from Row 7 down
+_EXPAND = str.maketrans({str(d): "." * d for d in range(1, 9)} | {"/": ""})
+_FEN_ROWS = np.repeat(np.arange(7, -1, -1), 8)
+_FEN_COLUMNS = np.tile(np.arange(8), 8)
+_FEN_SQUARES = _FEN_ROWS * 8 + _FEN_COLUMNS
+# Attacks of the Pieces that do not slide, by Square
+_STEP_ATTACKS = {"PA": PAWN_ATTACKS, "KN": KNIGHT_ATTACKS, "KI": KING_ATTACKS}
+_RUNS = re.compile(r"\.+")
+
+
+def planes_count(extras=()) -> int:
+    return EMPTY + sum(EXTRA_PLANES[extra] for extra in extras)
+
+
+def unpack_masks(masks: np.ndarray) -> np.ndarray:
+    """
+    Function to turn 64 bit Square masks of any shape
+    into 8x8 planes of 0 and 1
+    """
+    masks = np.ascontiguousarray(masks, dtype="<u8")
+    bits = np.unpackbits(masks.view(np.uint8).reshape(masks.shape + (8,)), axis=-1, bitorder="little")
+    return bits.reshape(masks.shape + (8, 8))
+
+
+def piece_masks(board: ChessBoard):
+    """
+    Function to get one Square mask per piece plane of a Board
+    """
+    if board.bits is not None:
+        pieces = board.bits.pieces
+        return [pieces[team].get(p_type, 0) for team, p_type in PIECE_PLANES]
+    masks = dict.fromkeys(PIECE_PLANES, 0)
+    squares = board.all_pos.squares
+    for r_id in range(len(board.all_pos)):
+        sq = squares[r_id]
+        if sq == DEAD:
+            continue
+        piece = board.board[POSITIONS[sq]].piece
+        if (piece.team, piece.p_type) in masks:
+            masks[piece.team, piece.p_type] |= 1 << sq
+    return list(masks.values())
+
+
+def attacked_masks(board: ChessBoard):
+    """
+    Function to get the Squares attacked by White and by Black,
+    the Kings' steps included
+    """
+    bits = board.bits if board.bits is not None else BitBoard.from_board(board.board)
+    masks = []
+    for team in ("W", "B"):
+        mask = bits.attacked[team]
+        king = bits.pieces[team].get("KI", 0)
+        if king:
+            mask |= KING_ATTACKS[king.bit_length() - 1]
+        masks.append(mask)
+    return masks
+
+
+def placement_attacked_masks(codes: np.ndarray):
+    """
+    Function to get the Squares attacked by White and by Black
+    from the plane codes of one FEN placement, the Kings' steps included
+    """
+    filled = np.flatnonzero(codes != EMPTY)
+    pieces = [(sq, PIECE_PLANES[code]) for sq, code in zip(_FEN_SQUARES[filled].tolist(), codes[filled].tolist())]
+    # Only the occupancy is needed for the reach of every Piece
+    bits = BitBoard()
+    for sq, (team, _) in pieces:
+        bits.teams[team] |= 1 << sq
+    masks = {"W": 0, "B": 0}
+    for sq, (team, p_type) in pieces:
+        table = _STEP_ATTACKS.get(p_type)
+        if table is None:
+            masks[team] |= bits.reach_of(sq, team, p_type)
+        else:
+            masks[team] |= (table[team] if p_type == "PA" else table)[sq]
+    return [masks["W"], masks["B"]]
+
+
+def encode_planes(positions: list, extras=(), dtype=np.uint8, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    Function to encode ChessBoards and FEN strings into planes,
+    filling out (N, planes_count(extras), 8, 8) when given
+    """
+    count, depth = len(positions), planes_count(extras)
+    if out is None:
+        out = np.zeros((count, depth, 8, 8), dtype=dtype)
+    else:
+        if out.shape != (count, depth, 8, 8):
+            raise ValueError(f"out has shape {out.shape}, needs {(count, depth, 8, 8)}")
+        out[...] = 0
+    fens = [i for i, position in enumerate(positions) if isinstance(position, str)]
+    boards = [i for i, position in enumerate(positions) if not isinstance(position, str)]
+    codes = None
+    if fens:
+        fields = [positions[i].split() for i in fens]
+        placement = "".join(f[0] for f in fields).translate(_EXPAND).encode()
+        if len(placement) != 64 * len(fens):
+            # Find the FEN at fault
+            for i, f in zip(fens, fields):
+                if len(f[0].translate(_EXPAND)) != 64:
+                    raise ValueError(f"FEN placement does not cover 64 Squares: {positions[i]!r}")
+        codes = FEN_PLANES[np.frombuffer(placement, dtype=np.uint8).reshape(len(fens), 64)]
+        rows = np.asarray(fens)[:, None]
+        filled = codes != EMPTY
+        out[np.broadcast_to(rows, codes.shape)[filled], codes[filled],
+            np.broadcast_to(_FEN_ROWS, codes.shape)[filled], np.broadcast_to(_FEN_COLUMNS, codes.shape)[filled]] = 1
+    if boards:
+        masks = np.array([piece_masks(positions[i]) for i in boards], dtype=np.uint64)
+        out[boards, :EMPTY] = unpack_masks(masks)
+    plane = EMPTY
+    for extra in extras:
+        if extra == "turn":
+            turns = [p.split()[1] == "w" if isinstance(p, str) else p.turn == "W" for p in positions]
+            out[np.flatnonzero(turns), plane] = 1
+        elif extra == "castling":
+            for i, position in enumerate(positions):
+                if isinstance(position, str):
+                    fields = position.split()
+                    rights = fields[2] if len(fields) > 2 else "-"
+                else:
+                    rights = castling_rights(position)
+                for k, (letter, _, _) in enumerate(CASTLING):
+                    if letter in rights:
+                        out[i, plane + k] = 1
+        elif extra == "attacked":
+            rows = {i: k for k, i in enumerate(fens)}
+            masks = np.array([placement_attacked_masks(codes[rows[i]]) if isinstance(p, str) else attacked_masks(p)
+                              for i, p in enumerate(positions)], dtype=np.uint64).reshape(count, 2)
+            out[:, plane:plane + 2] = unpack_masks(masks)
+        else:
+            raise ValueError(f"Unknown plane {extra!r}, expected one of {list(EXTRA_PLANES)}")
+        plane += EXTRA_PLANES[extra]
+    return out
+
+
+def decode_planes(planes: np.ndarray, extras=()) -> list:
+    """
+    Function to read planes back as FEN strings,
+    White to move and no Castling unless those planes are there
+    """
+    planes = np.asarray(planes)
+    count = planes.shape[0]
+    pieces = planes[:, :EMPTY].reshape(count, EMPTY, 64) > 0
+    codes = np.where(pieces.any(axis=1), pieces.argmax(axis=1), EMPTY)
+    # FEN order is Row 7 first
+    letters = PLANE_LETTERS[codes].reshape(count, 8, 8)[:, ::-1]
+    turns, rights = ["w"] * count, ["-"] * count
+    plane = EMPTY
+    for extra in extras:
+        if extra == "turn":
+            turns = ["w" if white else "b" for white in planes[:, plane, 0, 0] > 0]
+        elif extra == "castling":
+            flags = planes[:, plane:plane + 4, 0, 0] > 0
+            rights = ["".join(letter for (letter, _, _), flag in zip(CASTLING, row) if flag) or "-" for row in flags]
+        plane += EXTRA_PLANES[extra]
+    fens = []
+    for n in range(count):
+        rows = letters[n].tobytes().decode()
+        placement = "/".join(_RUNS.sub(lambda run: str(len(run.group())), rows[x:x + 8]) for x in range(0, 64, 8))
+        fens.append(f"{placement} {turns[n]} {rights[n]} - 0 1")
+    return fens
+
+
+if __name__ == "__main__":
+    from Notation import START, from_fen, to_fen
+
+    parser = argparse.ArgumentParser(description="Encoding speed of FEN strings and Boards into planes")
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--extras", nargs="*", default=["turn", "castling"], choices=list(EXTRA_PLANES))
+    args = parser.parse_args()
+    samples = [START, "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+               "8/5pk1/6p1/8/3Q4/6P1/5PK1/q7 b - - 0 40", "r3k2r/8/8/8/8/8/8/R3K2R b Kq - 0 1"]
+    fens = (samples * (args.count // len(samples) + 1))[:args.count]
+    out = np.empty((args.count, planes_count(args.extras), 8, 8), dtype=np.uint8)
+    start = time.perf_counter()
+    encode_planes(fens, args.extras, out=out)
+    elapsed = time.perf_counter() - start
+    print(f"FEN:   {args.count} positions in {elapsed:.2f}s, {60 * args.count / elapsed:,.0f} per minute")
+    boards = [from_fen(fen, True) for fen in samples]
+    boards = (boards * (args.count // len(boards) + 1))[:args.count]
+    start = time.perf_counter()
+    encode_planes(boards, args.extras, out=out)
+    elapsed = time.perf_counter() - start
+    print(f"Board: {args.count} positions in {elapsed:.2f}s, {60 * args.count / elapsed:,.0f} per minute")
+    assert decode_planes(out[:len(samples)], args.extras) == [
+        " ".join(to_fen(board).split()[:3]) + " - 0 1" for board in boards[:len(samples)]]
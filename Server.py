@@ -0,0 +1,502 @@
+"""
+Asyncio HTTP/WebSocket server hosting many ChessBoard games in one process
+
+    POST   /games                  new game, returns its id
+    GET    /games/{id}             pieces (get_board), side to move and check flags
+    GET    /games/{id}/moves       every legal move of the side to move (strict_moves rows)
+    GET    /games/{id}/moves?pos=r,c   moves of one Piece (trace_path)
+    POST   /games/{id}/move        {"from": [r, c], "to": [r, c], "p_conv": "QU"}
+    DELETE /games/{id}
+    GET    /games/{id}/ws          WebSocket, messages {"op": "board" | "moves" | "move", ...}
+    GET    /metrics                latency per endpoint, session count and trace_path cache hits
+                                   (and Profiler counters with --profile)
+    GET    /metrics/moves          with --profile, the time and calls of the latest moves
+
+With --store, idle games are checkpointed to a GameStore file instead of dropped,
+and come back from it on their next request, also after a restart.
+
+Board work runs on a thread pool, so it shares one core under the GIL whatever --workers is:
+the workers keep slow requests from blocking the event loop, they do not add CPU.
+For more cores, run one server per core, each with its own --store file, behind a balancer.
+
+Usage: python Server.py [--host H] [--port P] [--workers N] [--idle SECONDS] [--store PATH] [--profile]
+"""
+import argparse
+import asyncio
+import base64
+import hashlib
+import json
+import struct
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from BitBoard import PROMOTIONS, square
+from ChessBoard import ChessBoard, Prediction
+from GameStore import GameStore
+from Notation import pack_move
+from Profiler import PROFILER
+
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+REASONS = {200: "OK", 101: "Switching Protocols", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable"}
+MAX_BODY = 1 << 16
+
+
+class HttpError(Exception):
+    """
+    Error to answer a request with a Status and Message
+    """
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    """
+    Class to hold one Game with its Lock, its moves
+    and the time it was last used
+    """
+    def __init__(self, board: ChessBoard, moves: list | None = None):
+        self.board = board
+        self.moves = [] if moves is None else moves
+        self.lock = asyncio.Lock()
+        self.last_used = time.monotonic()
+
+
+class Metrics:
+    """
+    Class to collect request latencies per endpoint,
+    keeping the latest samples for percentiles
+    """
+    def __init__(self, samples: int = 1024):
+        self.samples = samples
+        self.stats = {}
+
+    def record(self, name: str, seconds: float):
+        stat = self.stats.get(name)
+        if stat is None:
+            stat = self.stats[name] = {"count": 0, "total": 0.0, "max": 0.0, "recent": deque(maxlen=self.samples)}
+        stat["count"] += 1
+        stat["total"] += seconds
+        stat["max"] = max(stat["max"], seconds)
+        stat["recent"].append(seconds)
+
+    def report(self):
+        result = {}
+        for name, stat in self.stats.items():
+            recent = sorted(stat["recent"])
+            result[name] = {
+                "count": stat["count"],
+                "mean_ms": 1000 * stat["total"] / stat["count"],
+                "p50_ms": 1000 * recent[len(recent) // 2],
+                "p99_ms": 1000 * recent[min(len(recent) - 1, len(recent) * 99 // 100)],
+                "max_ms": 1000 * stat["max"],
+            }
+        return result
+
+
+def parse_pos(value) -> Tuple[int, int]:
+    """
+    Function to read a Position from [r, c] or "r,c"
+    """
+    if isinstance(value, str):
+        value = value.split(",")
+    try:
+        x, y = (int(v) for v in value)
+    except (TypeError, ValueError):
+        raise HttpError(400, f"Bad position: {value!r}")
+    if not (0 <= x < 8 and 0 <= y < 8):
+        raise HttpError(400, f"Position off the board: {value!r}")
+    return x, y
+
+
+def board_state(board: ChessBoard):
+    return {
+        "turn": board.turn,
+        "check": {"W": board.is_w_on_check, "B": board.is_b_on_check},
+        "pieces": board.get_board(),
+    }
+
+
+def play(board: ChessBoard, i_pos: Tuple[int, int], n_pos: Tuple[int, int], p_conv: str | None):
+    """
+    Function to validate a move against the strict legal moves and play it,
+    then tell if it gave Check, Checkmate or Stalemate
+    """
+    if p_conv is not None and p_conv not in PROMOTIONS:
+        raise HttpError(400, f"p_conv must be one of {', '.join(PROMOTIONS)}")
+    piece = board.board[i_pos].piece
+    if piece is None:
+        raise HttpError(409, f"No piece at {list(i_pos)}")
+    if piece.team != board.turn:
+        raise HttpError(409, f"It is {board.turn}'s turn")
+    code = PROMOTIONS.index(p_conv or "QU") + 1 if piece.p_type == "PA" and n_pos[0] in {0, 7} else 0
+    # Castling is listed as the King moving onto its own Rook, like move() takes it
+    if [square(i_pos), square(n_pos), code] not in board.strict_moves().tolist():
+        raise HttpError(409, f"Illegal move {list(i_pos)} -> {list(n_pos)}")
+    team = board.turn
+    board.move(i_pos, n_pos, p_conv=p_conv)
+    result = board_state(board)
+    # move() takes the move back itself if it leaves the King attacked by its own reckoning
+    result["moved"] = board.turn != team
+    result["move"] = pack_move(square(i_pos), square(n_pos), code)
+    result["status"] = board.status() if result["moved"] else None
+    result["mate"] = result["status"] == "checkmate"
+    return result
+
+
+def legal(board: ChessBoard, pos: Tuple[int, int] | None):
+    if pos is not None:
+        if board.board[pos].piece is None:
+            raise HttpError(404, f"No piece at {list(pos)}")
+        return {"moves": Prediction(board).trace_path(pos)}
+    return {"turn": board.turn, "moves": board.strict_moves().tolist()}
+
+
+class GameServer:
+    """
+    Class to serve many ChessBoard games over HTTP and WebSocket,
+    running board work on a worker pool under a per-game Lock
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 8000, workers: int = 4,
+                 idle_timeout: float = 600.0, max_sessions: int = 100000, bitboard: bool = True,
+                 store: str | None = None):
+        self.host, self.port = host, port
+        self.store = GameStore(store) if store is not None else None
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.bitboard = bitboard
+        self.sessions = {}
+        self.metrics = Metrics()
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.server = None
+        self.reaper = None
+
+    async def start(self):
+        """
+        Function to start listening (port 0 picks a free port)
+        and the idle session eviction
+        """
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.server.sockets[0].getsockname()[1]
+        self.reaper = asyncio.create_task(self.evict_loop())
+
+    async def stop(self):
+        self.reaper.cancel()
+        self.server.close()
+        await self.server.wait_closed()
+        self.pool.shutdown(wait=False)
+        if self.store is not None:
+            self.checkpoint()
+            self.store.close()
+
+    async def serve_forever(self):
+        await self.start()
+        async with self.server:
+            await self.server.serve_forever()
+
+    def evict(self):
+        """
+        Function to drop Sessions idle for longer than the timeout,
+        saving them to the store first
+        """
+        deadline = time.monotonic() - self.idle_timeout
+        stale = [key for key, s in self.sessions.items() if s.last_used < deadline and not s.lock.locked()]
+        for key in stale:
+            session = self.sessions.pop(key)
+            if self.store is not None:
+                self.store.save(key, session.board, session.moves)
+        if stale and self.store is not None:
+            self.store.file.flush()
+        return len(stale)
+
+    def checkpoint(self):
+        """
+        Function to save every live Session to the store
+        """
+        for key, session in self.sessions.items():
+            self.store.save(key, session.board, session.moves)
+        self.store.file.flush()
+
+    async def evict_loop(self):
+        while True:
+            await asyncio.sleep(max(1.0, min(60.0, self.idle_timeout / 2)))
+            self.evict()
+
+    def session(self, game_id: str) -> Session:
+        session = self.sessions.get(game_id)
+        if session is None and self.store is not None and game_id in self.store:
+            session = Session(self.store.load(game_id, self.bitboard), self.store.packed(game_id).tolist())
+            self.sessions[game_id] = session
+        if session is None:
+            raise HttpError(404, f"No game {game_id}")
+        session.last_used = time.monotonic()
+        return session
+
+    def exists(self, game_id: str):
+        return game_id in self.sessions or (self.store is not None and game_id in self.store)
+
+    async def run(self, session: Session, fn, *args):
+        """
+        Function to run board work on the worker pool,
+        one call at a time per Game
+        """
+        async with session.lock:
+            result = await asyncio.get_running_loop().run_in_executor(self.pool, fn, session.board, *args)
+            if fn is play and result["moved"]:
+                session.moves.append(result["move"])
+        session.last_used = time.monotonic()
+        return result
+
+    def new_game(self):
+        if len(self.sessions) >= self.max_sessions and not self.evict():
+            raise HttpError(503, "Too many games")
+        game_id = uuid.uuid4().hex
+        self.sessions[game_id] = Session(ChessBoard(self.bitboard))
+        return game_id
+
+    def trace_stats(self):
+        """
+        Function to add up the trace_path cache counters
+        of the live games
+        """
+        hits = misses = evictions = 0
+        for session in self.sessions.values():
+            traces = session.board.traces
+            if traces is not None:
+                hits, misses, evictions = hits + traces.hits, misses + traces.misses, evictions + traces.evictions
+        lookups = hits + misses
+        return {"hits": hits, "misses": misses, "evictions": evictions, "hit_rate": hits / lookups if lookups else 0.0}
+
+    async def dispatch(self, method: str, parts: list, query: dict, body):
+        """
+        Function to route a request to its handler,
+        returning the Metrics name and the JSON payload
+        """
+        if parts == ["metrics"] and method == "GET":
+            payload = {"sessions": len(self.sessions), "endpoints": self.metrics.report(), "traces": self.trace_stats()}
+            if PROFILER.enabled:
+                payload["profile"] = PROFILER.report()
+            return "GET /metrics", payload
+        if parts == ["metrics", "moves"] and method == "GET":
+            if not PROFILER.enabled:
+                raise HttpError(404, "Profiling is off")
+            with PROFILER.lock:
+                return "GET /metrics/moves", list(PROFILER.moves)
+        if parts == ["games"] and method == "POST":
+            return "POST /games", {"id": self.new_game()}
+        if len(parts) < 2 or parts[0] != "games":
+            raise HttpError(404, "Not found")
+        session = self.session(parts[1])
+        match method, parts[2:]:
+            case "GET", []:
+                async with session.lock:
+                    return "GET /games/{id}", board_state(session.board)
+            case "DELETE", []:
+                self.sessions.pop(parts[1], None)
+                if self.store is not None:
+                    self.store.delete(parts[1])
+                return "DELETE /games/{id}", {"deleted": parts[1]}
+            case "GET", ["moves"]:
+                pos = parse_pos(query["pos"][0]) if "pos" in query else None
+                return "GET /games/{id}/moves", await self.run(session, legal, pos)
+            case "POST", ["move"]:
+                if not isinstance(body, dict) or "from" not in body or "to" not in body:
+                    raise HttpError(400, 'Body needs "from" and "to"')
+                args = parse_pos(body["from"]), parse_pos(body["to"]), body.get("p_conv")
+                return "POST /games/{id}/move", await self.run(session, play, *args)
+        if parts[2:] in ([], ["moves"], ["move"]):
+            raise HttpError(405, f"{method} not allowed here")
+        raise HttpError(404, "Not found")
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Function to serve one connection,
+        keeping it alive between requests
+        """
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except HttpError as e:
+                    write_response(writer, e.status, {"error": str(e)}, False)
+                    await writer.drain()
+                    break
+                if request is None:
+                    break
+                method, target, headers, body = request
+                url = urlsplit(target)
+                parts = [p for p in url.path.split("/") if p]
+                if headers.get("upgrade", "").lower() == "websocket":
+                    await self.websocket(reader, writer, parts, headers)
+                    break
+                start = time.perf_counter()
+                name = method + " " + url.path
+                try:
+                    data = json.loads(body) if body else None
+                    name, payload = await self.dispatch(method, parts, parse_qs(url.query), data)
+                    status = 200
+                except json.JSONDecodeError:
+                    status, payload = 400, {"error": "Body is not JSON"}
+                except HttpError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+                if status == 200:
+                    self.metrics.record(name, time.perf_counter() - start)
+                keep_alive = headers.get("connection", "").lower() != "close"
+                write_response(writer, status, payload, keep_alive)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def websocket(self, reader, writer, parts: list, headers: dict):
+        """
+        Function to serve a WebSocket bound to one Game
+        """
+        if len(parts) != 3 or parts[0] != "games" or parts[2] != "ws" or not self.exists(parts[1]):
+            write_response(writer, 404, {"error": "No such game"}, False)
+            return
+        if "sec-websocket-key" not in headers:
+            write_response(writer, 400, {"error": "Missing Sec-WebSocket-Key"}, False)
+            return
+        accept = base64.b64encode(hashlib.sha1((headers["sec-websocket-key"] + WS_GUID).encode()).digest())
+        writer.write(b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                     b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n")
+        await writer.drain()
+        while True:
+            message = await read_frame(reader, writer)
+            if message is None:
+                break
+            start = time.perf_counter()
+            op = None
+            try:
+                data = json.loads(message)
+                if not isinstance(data, dict):
+                    raise HttpError(400, "Message is not a JSON object")
+                op = data.get("op")
+                session = self.session(parts[1])
+                match op:
+                    case "board":
+                        async with session.lock:
+                            payload = board_state(session.board)
+                    case "moves":
+                        pos = parse_pos(data["pos"]) if "pos" in data else None
+                        payload = await self.run(session, legal, pos)
+                    case "move":
+                        args = parse_pos(data.get("from")), parse_pos(data.get("to")), data.get("p_conv")
+                        payload = await self.run(session, play, *args)
+                    case _:
+                        raise HttpError(400, f"Unknown op {op!r}")
+                self.metrics.record("ws " + op, time.perf_counter() - start)
+            except json.JSONDecodeError:
+                payload = {"error": "Message is not JSON"}
+            except HttpError as e:
+                payload = {"error": str(e)}
+            except Exception as e:
+                payload = {"error": f"{type(e).__name__}: {e}"}
+            payload["op"] = op
+            write_frame(writer, 0x1, json.dumps(payload).encode())
+            await writer.drain()
+
+
+async def read_request(reader: asyncio.StreamReader):
+    """
+    Function to read one HTTP/1.1 request
+    as Method, Target, lower-cased Headers and Body
+    """
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    try:
+        method, target, _ = line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(400, "Bad request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        key, _, value = line.decode("latin-1").partition(":")
+        headers[key.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(400, "Bad Content-Length")
+    if length < 0:
+        raise HttpError(400, "Bad Content-Length")
+    if length > MAX_BODY:
+        raise HttpError(413, "Body too large")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def write_response(writer: asyncio.StreamWriter, status: int, payload, keep_alive: bool = True):
+    body = json.dumps(payload).encode()
+    writer.write(f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                 .encode() + body)
+
+
+async def read_frame(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    """
+    Function to read the next WebSocket text message,
+    answering Pings on the way; None once the socket closes
+    """
+    message = b""
+    while True:
+        head = await reader.readexactly(2)
+        fin, opcode = head[0] & 0x80, head[0] & 0x0F
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length > MAX_BODY:
+            return None
+        mask = await reader.readexactly(4) if head[1] & 0x80 else b"\0\0\0\0"
+        data = bytes(b ^ mask[i & 3] for i, b in enumerate(await reader.readexactly(length)))
+        if opcode == 0x8:
+            write_frame(writer, 0x8, data[:2])
+            return None
+        if opcode == 0x9:
+            write_frame(writer, 0xA, data)
+            continue
+        if opcode in (0x0, 0x1, 0x2):
+            message += data
+            if fin:
+                return message.decode()
+
+
+def write_frame(writer: asyncio.StreamWriter, opcode: int, data: bytes):
+    if len(data) < 126:
+        head = struct.pack("!BB", 0x80 | opcode, len(data))
+    elif len(data) < 1 << 16:
+        head = struct.pack("!BBH", 0x80 | opcode, 126, len(data))
+    else:
+        head = struct.pack("!BBQ", 0x80 | opcode, 127, len(data))
+    writer.write(head + data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="ChessBoard game server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="board threads, all on one core under the GIL")
+    parser.add_argument("--idle", type=float, default=600.0, help="seconds before an idle game is dropped")
+    parser.add_argument("--store", help="GameStore file to checkpoint idle games to")
+    parser.add_argument("--profile", action="store_true", help="count and time the ChessBoard hot spots")
+    args = parser.parse_args()
+    if args.profile:
+        PROFILER.enable()
+    asyncio.run(GameServer(args.host, args.port, args.workers, args.idle, store=args.store).serve_forever())
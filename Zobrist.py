@@ -0,0 +1,94 @@
+import random
+
+
+# Fixed seed, so Keys stay the same across processes and restarts
+_rng = random.Random(0x5EED)
+SIDE = _rng.getrandbits(64)
+# Kings and Rooks still at their Initial Position (Castling rights)
+UNMOVED = [_rng.getrandbits(64) for _ in range(64)]
+CASTLERS = ("KI", "RO")
+_PIECES = {}
+
+
+def piece_keys(team: str, p_type: str):
+    """
+    Function to get the 64 Keys of a Piece Type,
+    made on first use for Promotion Types too
+    """
+    keys = _PIECES.get((team, p_type))
+    if keys is None:
+        rng = random.Random(team + " " + p_type)
+        keys = _PIECES[(team, p_type)] = [rng.getrandbits(64) for _ in range(64)]
+    return keys
+
+
+def board_key(board) -> int:
+    """
+    Function to compute the Zobrist Key of a ChessBoard from scratch
+    """
+    key = SIDE if board.turn == "B" else 0
+    for x in range(8):
+        for y in range(8):
+            piece = board.board[x, y].piece
+            if piece is not None:
+                key ^= piece_keys(piece.team, piece.p_type)[x * 8 + y]
+                if piece.p_type in CASTLERS and piece.is_start():
+                    key ^= UNMOVED[x * 8 + y]
+    return key
+
+
+class TranspositionTable:
+    """
+    Class to keep a bounded number of Values keyed by Position
+    with "always" or "depth" (keep the deeper entry) replacement
+    """
+    def __init__(self, size: int = 1 << 16, policy: str = "depth"):
+        if policy not in ("always", "depth"):
+            raise ValueError(f"Unknown replacement policy: {policy}")
+        self.size = size
+        self.policy = policy
+        self.keys = [None] * size
+        self.depths = [0] * size
+        self.values = [None] * size
+        self.count = 0
+
+    def store(self, key: int, value, depth: int = 0):
+        """
+        Function to save a Value for a Position,
+        unless the slot holds a deeper entry under the "depth" policy
+        """
+        i = key % self.size
+        old = self.keys[i]
+        if old is None:
+            self.count += 1
+        elif old != key and self.policy == "depth" and self.depths[i] > depth:
+            return False
+        self.keys[i] = key
+        self.depths[i] = depth
+        self.values[i] = value
+        return True
+
+    def probe(self, key: int, default=None):
+        """
+        Function to get the Value saved for a Position
+        """
+        i = key % self.size
+        if self.keys[i] == key:
+            return self.values[i]
+        return default
+
+    def depth(self, key: int):
+        i = key % self.size
+        return self.depths[i] if self.keys[i] == key else None
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.depths = [0] * self.size
+        self.values = [None] * self.size
+        self.count = 0
+
+    def __contains__(self, key: int):
+        return self.keys[key % self.size] == key
+
+    def __len__(self):
+        return self.count
@@ -0,0 +1,113 @@
+"""
+Checks of GameStore: reading back after later appends, deletes,
+compaction, reopening, and a record cut short by a crash
+
+Usage: python -m pytest -q test_game_store.py
+"""
+import os
+
+import numpy as np
+import pytest
+
+from ChessBoard import ChessBoard
+from GameStore import GameStore, MAGIC
+from Notation import encode, to_fen
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "games.bin")
+
+
+def played(moves):
+    board = ChessBoard()
+    for i_pos, n_pos in moves:
+        board.move(i_pos, n_pos)
+    return board
+
+
+OPENING = played([((1, 4), (3, 4)), ((6, 4), (4, 4))])
+
+
+def test_save_packed_save_load(path):
+    store = GameStore(path)
+    store.save("a", OPENING, [(12, 28, 0), (52, 36, 0)])
+    packed = store.packed("a")
+    store.save("b", ChessBoard(), [])
+    # The array taken before the append stays valid while the map is replaced
+    assert to_fen(store.load("b")) == to_fen(ChessBoard())
+    assert packed.tolist() == [12 | 28 << 6, 52 | 36 << 6]
+    assert store.moves("a").tolist() == [[12, 28, 0], [52, 36, 0]]
+    assert store.position("a") == encode(OPENING)
+    store.close()
+
+
+def test_latest_record_wins_and_survives_reopen(path):
+    store = GameStore(path)
+    store.save("a", ChessBoard(), [])
+    store.save("a", OPENING, [(12, 28, 0)])
+    store.close()
+    store = GameStore(path)
+    assert len(store) == 1
+    assert store.position("a") == encode(OPENING)
+    assert store.packed("a").tolist() == [12 | 28 << 6]
+    store.close()
+
+
+def test_delete(path):
+    store = GameStore(path)
+    store.save("a", OPENING, [])
+    store.save("b", OPENING, [])
+    store.delete("a")
+    store.delete("missing")
+    assert "a" not in store and "b" in store
+    with pytest.raises(KeyError):
+        store.load("a")
+    store.close()
+    store = GameStore(path)
+    assert list(store) == ["b"]
+    store.close()
+
+
+def test_compact(path):
+    store = GameStore(path)
+    for n in range(5):
+        store.save("a", OPENING, [(12, 28, 0)] * n)
+    store.save("b", ChessBoard(), [])
+    store.save("c", ChessBoard(), [])
+    store.delete("c")
+    packed = store.packed("a")
+    before = os.path.getsize(path)
+    store.compact()
+    assert os.path.getsize(path) < before
+    assert sorted(store) == ["a", "b"]
+    assert store.packed("a").tolist() == packed.tolist() == [12 | 28 << 6] * 4
+    store.save("d", OPENING, [])
+    assert store.position("d") == encode(OPENING)
+    store.close()
+    store = GameStore(path)
+    assert sorted(store) == ["a", "b", "d"]
+    store.close()
+
+
+def test_crash_tail_is_cut_off(path):
+    store = GameStore(path)
+    store.save("a", OPENING, [(12, 28, 0)])
+    store.close()
+    size = os.path.getsize(path)
+    with open(path, "ab") as file:
+        file.write(b"\x40\x00\x00\x00\x01\x00")
+    store = GameStore(path)
+    assert os.path.getsize(path) == size
+    assert list(store) == ["a"]
+    assert store.packed("a").dtype == np.dtype("<u2")
+    store.save("b", OPENING, [])
+    assert store.position("b") == encode(OPENING)
+    store.close()
+
+
+def test_not_a_store(path):
+    with open(path, "wb") as file:
+        file.write(b"x" * len(MAGIC))
+    with pytest.raises(ValueError):
+        GameStore(path)
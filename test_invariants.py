@@ -0,0 +1,166 @@
+"""
+Regression checks of the state ChessBoard keeps up to date step by step:
+Zobrist key, evaluation terms and BitBoard masks after moves and undos,
+take_back, clone isolation, and strict_moves against the perft references
+
+Usage: python -m pytest -q test_invariants.py
+"""
+import random
+
+import numpy as np
+import pytest
+
+import Perft
+from BitBoard import BitBoard, POSITIONS, PROMOTIONS
+from ChessBoard import ChessBoard, MoveCache
+from Evaluation import board_terms
+from Notation import encode, from_fen
+from Zobrist import board_key
+
+SEEDS = range(6)
+PLIES = 40
+# Castling on both sides and Pawns one step from converting
+FENS = [None, "r3k2r/pPpp1ppp/8/8/8/8/PpPP1PPP/R3K2R w KQkq - 0 1"]
+
+
+def fresh(fen: str | None, bitboard: bool) -> ChessBoard:
+    return ChessBoard(bitboard) if fen is None else from_fen(fen, bitboard)
+
+
+def play(board: ChessBoard, rng: random.Random, log: list | None = None) -> bool:
+    """
+    Function to play a random strict legal move, adding it to the log,
+    False when there is none
+    """
+    moves = board.strict_moves().tolist()
+    if not moves:
+        return False
+    move = rng.choice(moves)
+    replay(board, [move])
+    if log is not None:
+        log.append(move)
+    return True
+
+
+def replay(board: ChessBoard, moves: list):
+    for i_sq, n_sq, code in moves:
+        board.move(POSITIONS[i_sq], POSITIONS[n_sq], p_conv=PROMOTIONS[code - 1] if code else None)
+
+
+def state(board: ChessBoard):
+    return encode(board), board.key, board.terms, tuple(board.history), board.get_board()
+
+
+def assert_in_sync(board: ChessBoard):
+    assert board.key == board_key(board)
+    assert board.terms == board_terms(board)
+    if board.bits is not None:
+        built = BitBoard.from_board(board.board)
+        assert board.bits.squares == built.squares
+        assert board.bits.teams == built.teams
+        assert board.bits.unmoved == built.unmoved
+        assert board.bits.attacked == built.attacked
+        assert board.bits.reach == built.reach
+
+
+@pytest.mark.parametrize("bitboard", [False, True])
+@pytest.mark.parametrize("fen", FENS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_moves_and_undos(seed, fen, bitboard):
+    rng = random.Random(seed)
+    board = fresh(fen, bitboard)
+    for _ in range(PLIES):
+        before = state(board)
+        board.snap_shot()
+        for _ in range(rng.randrange(1, 4)):
+            if not play(board, rng):
+                break
+            assert_in_sync(board)
+        board.prev_cp()
+        assert state(board) == before
+        assert_in_sync(board)
+        if not play(board, rng):
+            break
+        assert_in_sync(board)
+
+
+@pytest.mark.parametrize("bitboard", [False, True])
+@pytest.mark.parametrize("fen", FENS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_take_back(seed, fen, bitboard):
+    rng = random.Random(seed)
+    board = fresh(fen, bitboard)
+    states = []
+    for _ in range(PLIES):
+        states.append(state(board))
+        if not play(board, rng):
+            break
+        # One history entry per move, Castling included
+        assert len(board.history) == len(states)
+    for ply in sorted(rng.sample(range(len(states)), min(5, len(states))), reverse=True):
+        board.take_back(ply)
+        assert state(board) == states[ply]
+        assert_in_sync(board)
+
+
+@pytest.mark.parametrize("bitboard", [False, True])
+@pytest.mark.parametrize("fen", FENS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_clone_isolation(seed, fen, bitboard):
+    rng = random.Random(seed)
+    board, trunk = fresh(fen, bitboard), []
+    for _ in range(rng.randrange(PLIES)):
+        if not play(board, rng, trunk):
+            break
+    before = state(board)
+    forks = [board.clone() for _ in range(3)]
+    forks.append(forks[0].clone())
+    branches = [[] for _ in forks]
+    for fork, branch in zip(forks, branches):
+        assert state(fork) == before
+        for _ in range(10):
+            if not play(fork, rng, branch):
+                break
+        assert_in_sync(fork)
+    assert state(board) == before
+    tail = []
+    for _ in range(5):
+        if not play(board, rng, tail):
+            break
+    # Every Board ends where the same moves take an unshared Board
+    for fork, branch in zip(forks + [board], branches + [tail]):
+        twin = fresh(fen, bitboard)
+        replay(twin, trunk + branch)
+        assert state(fork) == state(twin)
+
+
+@pytest.mark.parametrize("bitboard", [False, True])
+@pytest.mark.parametrize("name, moves, counts", Perft.POSITIONS, ids=[p[0] for p in Perft.POSITIONS])
+def test_strict_perft(name, moves, counts, bitboard):
+    board = Perft.setup(moves, bitboard)
+    for depth in sorted(counts):
+        if depth <= 3:
+            assert Perft.perft(board, depth, strict=True) == counts[depth]
+
+
+@pytest.mark.parametrize("bitboard", [False, True])
+def test_moves_into_a_buffer(bitboard):
+    board = ChessBoard(bitboard)
+    for generate in (board.legal_moves, board.strict_moves):
+        out = np.zeros((64, 3), dtype=np.uint8)
+        assert (generate(out=out) == generate()).all()
+        for bad in (np.zeros((64, 4), np.uint8), np.zeros(192, np.uint8),
+                    np.zeros((64, 3), np.int64), np.zeros((19, 3), np.uint8)):
+            with pytest.raises(ValueError):
+                generate(out=bad)
+
+
+def test_move_cache_keeps_recently_put_keys():
+    cache = MoveCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    # Putting "a" again makes "b" the least recently used
+    cache.put("a", 3)
+    cache.put("c", 4)
+    assert cache.get("b") is None and cache.get("a") == 3 and cache.get("c") == 4
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,115 @@
+"""
+Checks of the game server against a local client: games, moves,
+bad requests, metrics, and idle games going to the store and back
+
+Usage: python -m pytest -q test_server.py
+"""
+import asyncio
+import json
+
+from Server import GameServer
+
+
+async def request(port: int, method: str, path: str, body=None, headers: dict | None = None):
+    """
+    Function to send one HTTP request and read the Status and JSON payload
+    """
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    data = json.dumps(body).encode() if body is not None else b""
+    head = {"Host": "test", "Content-Length": str(len(data)), "Connection": "close"} | (headers or {})
+    writer.write(f"{method} {path} HTTP/1.1\r\n".encode()
+                 + "".join(f"{key}: {value}\r\n" for key, value in head.items()).encode() + b"\r\n" + data)
+    await writer.drain()
+    raw = await reader.read()
+    writer.close()
+    status, _, payload = raw.partition(b"\r\n\r\n")
+    return int(status.split()[1]), json.loads(payload)
+
+
+def serve(test, **kwargs):
+    async def main():
+        server = GameServer(port=0, **kwargs)
+        await server.start()
+        try:
+            await test(server)
+        finally:
+            await server.stop()
+    asyncio.run(main())
+
+
+def test_play_a_game():
+    async def test(server):
+        port = server.port
+        status, game = await request(port, "POST", "/games")
+        assert status == 200
+        game = game["id"]
+        status, moves = await request(port, "GET", f"/games/{game}/moves")
+        assert status == 200 and len(moves["moves"]) == 20 and moves["turn"] == "W"
+        status, played = await request(port, "POST", f"/games/{game}/move", {"from": [1, 4], "to": [3, 4]})
+        assert status == 200 and played["moved"] and played["turn"] == "B" and played["move"] == 12 | 28 << 6
+        # White again, the King onto its own Rook with Pieces between, and a Pawn jumping
+        for move in ({"from": [1, 3], "to": [3, 3]}, {"from": [7, 4], "to": [7, 7]}, {"from": [6, 4], "to": [3, 4]}):
+            status, error = await request(port, "POST", f"/games/{game}/move", move)
+            assert status == 409, error
+        status, piece = await request(port, "GET", f"/games/{game}/moves?pos=6,4")
+        assert status == 200 and piece["moves"] == [[5, 4], [4, 4]]
+        status, board = await request(port, "GET", f"/games/{game}")
+        assert status == 200 and board["pieces"]["W PA 4"] == [3, 4]
+        status, metrics = await request(port, "GET", "/metrics")
+        assert status == 200 and metrics["sessions"] == 1
+        assert metrics["endpoints"]["POST /games/{id}/move"]["count"] == 1
+        assert (await request(port, "GET", "/games/nope"))[0] == 404
+    serve(test)
+
+
+def test_mate_is_reported():
+    async def test(server):
+        port = server.port
+        game = (await request(port, "POST", "/games"))[1]["id"]
+        for i_pos, n_pos in (((1, 5), (2, 5)), ((6, 4), (4, 4)), ((1, 6), (3, 6)), ((7, 3), (3, 7))):
+            status, played = await request(port, "POST", f"/games/{game}/move", {"from": i_pos, "to": n_pos})
+            assert status == 200 and played["moved"]
+        assert played["mate"] and played["status"] == "checkmate"
+    serve(test)
+
+
+def test_bad_requests():
+    async def test(server):
+        port = server.port
+        game = (await request(port, "POST", "/games"))[1]["id"]
+        for length in ("ten", "-5"):
+            status, error = await request(port, "GET", "/metrics", headers={"Content-Length": length})
+            assert status == 400 and error["error"] == "Bad Content-Length"
+        status, error = await request(port, "GET", f"/games/{game}/ws", headers={"Upgrade": "websocket"})
+        assert status == 400
+        assert (await request(port, "POST", f"/games/{game}/move", {"from": [1, 4]}))[0] == 400
+        assert (await request(port, "PUT", f"/games/{game}/move"))[0] == 405
+        # The server keeps serving after them
+        assert (await request(port, "GET", "/metrics"))[0] == 200
+    serve(test)
+
+
+def test_idle_games_round_trip_through_the_store(tmp_path):
+    path = str(tmp_path / "games.bin")
+
+    async def first(server):
+        port = server.port
+        game = (await request(port, "POST", "/games"))[1]["id"]
+        await request(port, "POST", f"/games/{game}/move", {"from": [1, 4], "to": [3, 4]})
+        server.idle_timeout = 0
+        assert server.evict() == 1 and not server.sessions
+        status, board = await request(port, "GET", f"/games/{game}")
+        assert status == 200 and board["turn"] == "B" and board["pieces"]["W PA 4"] == [3, 4]
+        await request(port, "POST", f"/games/{game}/move", {"from": [6, 4], "to": [4, 4]})
+        games.append(game)
+
+    async def second(server):
+        # Live games are saved on stop, so a restart finds them
+        game = games[0]
+        status, board = await request(server.port, "GET", f"/games/{game}")
+        assert status == 200 and board["turn"] == "W" and board["pieces"]["B PA 4"] == [4, 4]
+        assert server.sessions[game].moves == [12 | 28 << 6, 52 | 36 << 6]
+
+    games = []
+    serve(first, store=path)
+    serve(second, store=path)